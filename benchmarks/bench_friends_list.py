@@ -0,0 +1,112 @@
+"""Benchmark: requests/s on a cached /friends/list with 5,000 friends
+
+Usage:
+    python -m benchmarks.bench_friends_list [--friends 5000] [--requests 200]
+
+Compares the old path (response_model validation + jsonable_encoder +
+stdlib JSON) with the current route (orjson, no re-validation, optional
+compression), served in-process through httpx's ASGI transport. The
+"fast" runs bypass the pre-rendered response cache so they measure
+rendering; the "pre-rendered" runs show what a response cache hit costs.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List
+import httpx
+from fastapi import FastAPI, Response
+from src.api.models import FriendData
+from src.api.routes import friends
+from src.api.prerender import ResponseCache
+from src.cache.cache_service import CacheRead
+
+
+def make_read(n: int) -> CacheRead:
+    now = datetime.utcnow()
+    data = [{
+        'id': str(100000 + i),
+        'name': f'Friend {i}',
+        'url': f'https://www.facebook.com/friend.{i}',
+        'mutual_friends': i % 250,
+        'profile_picture': f'https://scontent.fbcdn.net/v/t39.30808-1/{i}_n.jpg?stp=c0.0.100.100a_cp0_dst-jpg&_nc_cat=1'
+    } for i in range(n)]
+    return CacheRead(data=data, fetched_at=now, stale=False, expires_at=now + timedelta(hours=4),
+                     last_modified=now, version=f'bench-{n}')
+
+
+class StubCache:
+    """Stands in for AsyncCacheService with the L1 already warm"""
+
+    def __init__(self, read: CacheRead):
+        self.read = read
+
+    async def read_friends(self, allow_stale: bool = True):
+        return self.read
+
+
+class NoResponseCache:
+    """Stands in for the pre-rendered response cache: always a miss"""
+
+    async def get_or_render(self, key, render):
+        return None
+
+
+def baseline_app(read: CacheRead) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/friends/list", response_model=List[FriendData])
+    async def get_friends_list(response: Response, limit: int = 50):
+        response.headers["X-Cache-Hit"] = "true"
+        return read.data[:limit]
+
+    return app
+
+
+def current_app(read: CacheRead) -> FastAPI:
+    app = FastAPI()
+    friends.set_cache_service(StubCache(read))
+    app.include_router(friends.router)
+    return app
+
+
+async def measure(app: FastAPI, n_friends: int, n_requests: int, encoding: str):
+    transport = httpx.ASGITransport(app=app)
+    headers = {'Accept-Encoding': encoding}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        r = await client.get('/friends/list', params={'limit': n_friends}, headers=headers)
+        r.raise_for_status()
+        # httpx decompresses the body; Content-Length is what went over the wire
+        wire = int(r.headers.get('content-length', len(r.content)))
+
+        started = time.perf_counter()
+        for _ in range(n_requests):
+            await client.get('/friends/list', params={'limit': n_friends}, headers=headers)
+        elapsed = time.perf_counter() - started
+    return n_requests / elapsed, wire
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--friends', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    read = make_read(args.friends)
+    runs = [
+        ('baseline (validated)', baseline_app(read), 'identity', False),
+        ('fast, identity', current_app(read), 'identity', False),
+        ('fast, gzip', current_app(read), 'gzip', False),
+        ('fast, br', current_app(read), 'br', False),
+        ('pre-rendered, identity', current_app(read), 'identity', True),
+        ('pre-rendered, br', current_app(read), 'br', True),
+    ]
+    print(f"/friends/list with {args.friends} friends, {args.requests} requests per run")
+    for label, app, encoding, prerendered in runs:
+        friends.response_cache = ResponseCache() if prerendered else NoResponseCache()
+        rps, wire = await measure(app, args.friends, args.requests, encoding)
+        print(f"{label:<24} {rps:8.1f} req/s  {wire / 1024:8.1f} KiB on the wire")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
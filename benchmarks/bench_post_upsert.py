@@ -0,0 +1,100 @@
+"""Benchmark: per-post SELECT + INSERT/UPDATE vs batched upsert_posts
+
+Usage:
+    python -m benchmarks.bench_post_upsert [--posts 20] [--rounds 20]
+
+Each round writes the same batch twice (first insert, then update) into a
+fresh SQLite file, so both the INSERT and the ON CONFLICT paths are timed.
+"""
+import argparse
+import os
+import tempfile
+import json
+import time
+from datetime import datetime, timedelta
+from src.cache.database import CachedPost, init_database
+from src.cache.cache_service import CacheService
+
+
+def make_posts(n: int, round_no: int):
+    return [{
+        'id': f'https://www.facebook.com/photo/?fbid={round_no}{i}&set=a.1',
+        'author': {'name': 'Friend Name', 'profile_url': 'https://www.facebook.com/friend'},
+        'content': f'Post {i} of round {round_no} ' * 10,
+        'url': f'https://www.facebook.com/photo/?fbid={round_no}{i}&set=a.1',
+        'timestamp': '2026-01-29 12:00:00',
+        'image_url': f'https://scontent.fbcdn.net/v/{round_no}_{i}.jpg'
+    } for i in range(n)]
+
+
+def store_each(cache: CacheService, posts):
+    """The old store_post: one SELECT and one INSERT or UPDATE per post, each committed"""
+    for post in posts:
+        session = cache._get_session()
+        try:
+            now = datetime.utcnow()
+            existing = session.query(CachedPost).filter_by(id=post['id']).first()
+            if existing:
+                existing.content = post['content']
+                existing.fetched_at = now
+                existing.expires_at = now + timedelta(hours=1)
+            else:
+                session.add(CachedPost(
+                    id=post['id'],
+                    author_name=post['author']['name'],
+                    author_url=post['author']['profile_url'],
+                    content=post['content'],
+                    url=post['url'],
+                    timestamp=post['timestamp'],
+                    post_type='text',
+                    is_sponsored=False,
+                    is_suggested=False,
+                    source_type='friend',
+                    likes=0,
+                    comments=0,
+                    shares=0,
+                    images=json.dumps([post['image_url']]),
+                    videos=json.dumps([]),
+                    expires_at=now + timedelta(hours=1),
+                    fetched_at=now
+                ))
+            session.commit()
+        finally:
+            session.close()
+
+
+def store_batch(cache: CacheService, posts):
+    cache.upsert_posts(posts)
+
+
+def run(label: str, writer, n_posts: int, rounds: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = CacheService(init_database(os.path.join(tmp, 'bench.db')))
+        elapsed = 0.0
+        for r in range(rounds):
+            posts = make_posts(n_posts, r)
+            for _ in range(2):  # insert, then update
+                started = time.perf_counter()
+                writer(cache, posts)
+                elapsed += time.perf_counter() - started
+
+    writes = n_posts * rounds * 2
+    print(f"{label:<22} {elapsed * 1000:9.1f} ms total  "
+          f"{elapsed * 1000 / (rounds * 2):8.2f} ms/batch  {writes / elapsed:9.0f} posts/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=20, help='posts per batch')
+    parser.add_argument('--rounds', type=int, default=20, help='batches to write')
+    args = parser.parse_args()
+
+    print(f"Writing {args.rounds} batches of {args.posts} posts (each inserted then updated)")
+    per_post = run('per-post (row by row)', store_each, args.posts, args.rounds)
+    batched = run('upsert_posts (batch)', store_batch, args.posts, args.rounds)
+    print(f"Speedup: {per_post / batched:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: cache read latency under concurrent writes, default engine vs tuned engine
+
+Usage:
+    python -m benchmarks.bench_sqlite_concurrency [--readers 4] [--writers 1] [--seconds 5]
+
+Reader threads call read_posts while writer threads upsert batches of posts,
+first against a plain create_engine() database (rollback journal, the old
+setup) and then against init_database() for each CACHE_DB_PROFILE.
+
+read_posts is mostly Python (ORM rows to dicts) and holds the GIL, so
+reads/s is capped by the interpreter whatever the journal mode. What the
+journal mode changes is how long a read waits on a writer's lock, which
+shows in the read latency tail (p99 / max).
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine
+from src.cache.database import Base, SQLITE_PROFILES, init_database
+from src.cache.cache_service import CacheService
+from benchmarks.bench_post_upsert import make_posts
+
+
+def baseline_engine(db_path: str):
+    engine = create_engine(f'sqlite:///{db_path}', connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def run(label: str, engine, readers: int, writers: int, seconds: float, batch: int, interval: float):
+    cache = CacheService(engine)
+    cache.upsert_posts(make_posts(batch, 0))
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                cache.read_posts(limit=20)
+                key = 'reads'
+            except Exception:
+                key = 'errors'
+            elapsed = time.perf_counter() - started
+            with lock:
+                counts[key] += 1
+                latencies.append(elapsed)
+            time.sleep(interval)
+
+    def writer(n):
+        round_no = n * 1_000_000
+        while time.perf_counter() < deadline:
+            round_no += 1
+            try:
+                cache.upsert_posts(make_posts(batch, round_no))
+                key = 'writes'
+            except Exception:
+                key = 'errors'
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    latencies.sort()
+    p50, p99 = (latencies[int(len(latencies) * q)] * 1000 for q in (0.5, 0.99))
+    print(f"{label:<20} {counts['reads'] / seconds:7.0f} reads/s  p50 {p50:6.2f} ms  p99 {p99:7.2f} ms  "
+          f"max {latencies[-1] * 1000:7.1f} ms  {counts['writes'] * batch / seconds:7.0f} posts written/s  "
+          f"{counts['errors']:4d} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--batch', type=int, default=500, help='posts per write')
+    parser.add_argument('--interval', type=float, default=0.01,
+                        help='seconds each reader pauses between reads (0 saturates the CPU)')
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per run")
+    with tempfile.TemporaryDirectory() as tmp:
+        run('default (journal)', baseline_engine(os.path.join(tmp, 'baseline.db')),
+            args.readers, args.writers, args.seconds, args.batch, args.interval)
+        for profile in SQLITE_PROFILES:
+            engine = init_database(os.path.join(tmp, f'{profile}.db'), profile=profile)
+            run(f'WAL {profile}', engine, args.readers, args.writers, args.seconds, args.batch, args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,37 @@ class Settings:
     
     COOKIES_FILE: str = "cookies.json"
     
+    # Page pool (tabs leased per request)
+    PAGE_POOL_MIN_SIZE: int = int(os.getenv("PAGE_POOL_MIN_SIZE", "1"))
+    PAGE_POOL_MAX_SIZE: int = int(os.getenv("PAGE_POOL_MAX_SIZE", "4"))
+    PAGE_POOL_MAX_NAVIGATIONS: int = int(os.getenv("PAGE_POOL_MAX_NAVIGATIONS", "50"))
+    
+    # Feed aggregation
+    FEED_CONCURRENCY: int = int(os.getenv("FEED_CONCURRENCY", "1"))  # tabs; 1 = sequential
+    FEED_MAX_FRIENDS: int = int(os.getenv("FEED_MAX_FRIENDS", "2"))
+    FEED_POSTS_PER_FRIEND: int = int(os.getenv("FEED_POSTS_PER_FRIEND", "6"))
+    SCROLL_MAX: int = int(os.getenv("SCROLL_MAX", "15"))  # upper bound on timeline scrolls
+    SCROLL_IDLE_LIMIT: int = int(os.getenv("SCROLL_IDLE_LIMIT", "2"))  # stop after N scrolls with no GraphQL
+    SCROLL_RESPONSE_TIMEOUT: float = float(os.getenv("SCROLL_RESPONSE_TIMEOUT", "4"))  # seconds
+    GRAPHQL_FIRST: bool = os.getenv("GRAPHQL_FIRST", "true").lower() == "true"  # skip per-post navigation when possible
+    LEAN_SCRAPING: bool = os.getenv("LEAN_SCRAPING", "false").lower() == "true"  # block images/media/beacons
+    LEAN_BASELINE_EVERY: int = int(os.getenv("LEAN_BASELINE_EVERY", "50"))  # unblocked sample load per N lean loads; 0 = first only
+    
     # Cache settings
     CACHE_DB_PATH: str = os.getenv("CACHE_DB_PATH", "cache.db")
     CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_DB_PROFILE: str = os.getenv("CACHE_DB_PROFILE", "balanced")  # durable, balanced or fast
+    CACHE_DB_BUSY_TIMEOUT: int = int(os.getenv("CACHE_DB_BUSY_TIMEOUT", "5000"))  # ms to wait on a locked DB
+    CACHE_DB_POOL_SIZE: int = int(os.getenv("CACHE_DB_POOL_SIZE", "5"))
+    CACHE_DB_THREADS: int = int(os.getenv("CACHE_DB_THREADS", "4"))  # worker threads running cache queries
+    
+    # In-process L1 in front of SQLite
+    CACHE_L1_ENABLED: bool = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+    CACHE_L1_MAX_ENTRIES: int = int(os.getenv("CACHE_L1_MAX_ENTRIES", "256"))
+    CACHE_L1_MAX_MB: int = int(os.getenv("CACHE_L1_MAX_MB", "32"))
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "30"))  # seconds
+    CACHE_L1_POLICY: str = os.getenv("CACHE_L1_POLICY", "lru")  # lru or lfu eviction
+    CACHE_L1_SWEEP_INTERVAL: float = float(os.getenv("CACHE_L1_SWEEP_INTERVAL", "10"))  # seconds between expiry sweeps
     
     # Refresh intervals (minutes)
     CACHE_REFRESH_POSTS: int = int(os.getenv("CACHE_REFRESH_POSTS", "5"))
@@ -31,8 +59,39 @@ class Settings:
     CACHE_EXPIRY_PROFILE: int = int(os.getenv("CACHE_EXPIRY_PROFILE", "8"))
     CACHE_EXPIRY_REQUESTS: int = int(os.getenv("CACHE_EXPIRY_REQUESTS", "2"))
     
+    # Stale-while-revalidate: past expiry, cached data is still served (and refreshed
+    # in the background) until it is this many hours old
+    CACHE_STALE_WHILE_REVALIDATE: bool = os.getenv("CACHE_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+    CACHE_STALE_MAX_POSTS: int = int(os.getenv("CACHE_STALE_MAX_POSTS", "24"))
+    CACHE_STALE_MAX_FRIENDS: int = int(os.getenv("CACHE_STALE_MAX_FRIENDS", "72"))
+    CACHE_STALE_MAX_PROFILE: int = int(os.getenv("CACHE_STALE_MAX_PROFILE", "168"))
+    CACHE_STALE_MAX_REQUESTS: int = int(os.getenv("CACHE_STALE_MAX_REQUESTS", "24"))
+    
+    # Media cache
+    MEDIA_CACHE_DIR: str = os.getenv("MEDIA_CACHE_DIR", "image_cache")
+    MEDIA_CACHE_MAX_MB: int = int(os.getenv("MEDIA_CACHE_MAX_MB", "1024"))  # disk quota; least recently used images evicted
+    MEDIA_ACCESS_FLUSH_AFTER: int = int(os.getenv("MEDIA_ACCESS_FLUSH_AFTER", "256"))  # pending access times before writing them
+    MEDIA_ACCESS_FLUSH_INTERVAL: float = float(os.getenv("MEDIA_ACCESS_FLUSH_INTERVAL", "30"))  # seconds between access-time writes
+    MEDIA_FETCH_CONCURRENCY: int = int(os.getenv("MEDIA_FETCH_CONCURRENCY", "8"))  # downloads at once
+    MEDIA_FETCH_PER_HOST: int = int(os.getenv("MEDIA_FETCH_PER_HOST", "4"))  # downloads at once per CDN host
+    MEDIA_PREFETCH_QUEUE: int = int(os.getenv("MEDIA_PREFETCH_QUEUE", "256"))  # queued prefetches before dropping
+    MEDIA_FETCH_TIMEOUT: float = float(os.getenv("MEDIA_FETCH_TIMEOUT", "10"))  # seconds
+    MEDIA_HTTP2: bool = os.getenv("MEDIA_HTTP2", "true").lower() == "true"
+    MEDIA_CAPTURE: bool = os.getenv("MEDIA_CAPTURE", "false").lower() == "true"  # keep images the scraper's browser loads
+    MEDIA_CAPTURE_MAX_MB: int = int(os.getenv("MEDIA_CAPTURE_MAX_MB", "64"))  # captured bodies held until posts are extracted
+    MEDIA_MAX_AGE: int = int(os.getenv("MEDIA_MAX_AGE", "31536000"))  # seconds clients may keep an image
+    MEDIA_VARIANT_QUALITY: int = int(os.getenv("MEDIA_VARIANT_QUALITY", "80"))  # JPEG/WebP quality for resized images
+    MEDIA_VARIANT_MAX_DIMENSION: int = int(os.getenv("MEDIA_VARIANT_MAX_DIMENSION", "2048"))  # largest w/h accepted
+    
+    # Response encoding
+    RESPONSE_COMPRESS_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))  # smaller bodies go uncompressed
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "64"))  # pre-rendered query shapes
+    
     # Rate limiting
     CACHE_MIN_SCRAPE_INTERVAL: int = int(os.getenv("CACHE_MIN_SCRAPE_INTERVAL", "60"))  # seconds
     CACHE_MAX_ERROR_COUNT: int = int(os.getenv("CACHE_MAX_ERROR_COUNT", "3"))
+    SCRAPE_COALESCE_WINDOW: float = float(os.getenv("SCRAPE_COALESCE_WINDOW", "10"))  # seconds a finished scrape is reused
 
 settings = Settings()
@@ -0,0 +1,56 @@
+"""Conditional GET (ETag / Last-Modified / 304) for cached responses"""
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+
+
+def etag_for(read, *variant) -> str:
+    """Strong ETag for a CacheRead, plus anything else that shapes the body (e.g. a limit)"""
+    tag = hashlib.sha1(f"{read.version}:{variant!r}".encode()).hexdigest()[:32]
+    return f'"{tag}"'
+
+
+def not_modified(request: Request, response: Response, read, *variant) -> Optional[Response]:
+    """Set ETag/Last-Modified for a cached body; return a 304 if the client's copy is current
+
+    If-None-Match wins over If-Modified-Since, as in RFC 9110. Headers
+    already set on `response` (staleness, Age) are carried onto the 304.
+    """
+    etag = etag_for(read, *variant)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if read.last_modified:
+        response.headers["Last-Modified"] = format_datetime(
+            read.last_modified.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True
+        )
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = etag_matches(if_none_match, etag)
+    else:
+        current = unmodified_since(request.headers.get("if-modified-since"), read.last_modified)
+
+    if not current:
+        return None
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return Response(status_code=304, headers=headers)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+def unmodified_since(if_modified_since: Optional[str], last_modified) -> bool:
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
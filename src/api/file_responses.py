@@ -0,0 +1,101 @@
+"""Serve cached files with Range, ETag and long-lived Cache-Control"""
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from src.api.conditional import etag_matches, unmodified_since
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range
+
+    Returns None when there is no usable Range header (serve the whole
+    file) and raises ValueError when the range can't be satisfied.
+    Multi-range requests are answered with the whole file.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _iter_range(path: Path, start: int, end: int):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def serve_file(request: Request, path: Path, media_type: str, max_age: int,
+                     content_hash: str) -> Response:
+    """Send a cached file that never changes under its URL
+
+    `content_hash` identifies the file's bytes (the media store names
+    files by it; a variant passes its file name) and becomes a strong
+    ETag as is, so the file is never read to compute one. Whole files go out through FileResponse (sendfile where
+    the server supports it). Sets an immutable Cache-Control, answers
+    If-None-Match / If-Modified-Since with 304 and a single
+    `Range: bytes=` request with 206.
+    """
+    stat = await run_in_threadpool(os.stat, path)
+    last_modified = datetime.utcfromtimestamp(stat.st_mtime)
+    etag = f'"{content_hash}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = etag_matches(if_none_match, etag)
+    else:
+        current = unmodified_since(request.headers.get("if-modified-since"), last_modified)
+    if current:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != etag:
+        # The client's partial copy is of another version; send it all
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, stat.st_size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{stat.st_size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_range(path, start, end), status_code=206,
+                             headers=headers, media_type=media_type)
@@ -4,7 +4,10 @@ from contextlib import asynccontextmanager
 from src.api.routes import posts, profile, friends, groups, messages, search, events, pages, marketplace, stories, auth, media, graph_api, debug
 from src.api.routes import cache as cache_routes
 from src.api.models import AuthRequest, AuthResponse, HealthResponse
+from src.api.responses import FastJSONResponse
+from src.api.prerender import response_cache
 from src.scraper.session_manager import SessionManager
+from src.scraper.page_pool import LeasedService
 from src.scraper.preflight_checker import PreflightChecker
 from src.scraper.selector_manager import SelectorManager
 from src.scraper.profile_service import ProfileService
@@ -19,6 +22,8 @@ from src.services.marketplace_service import MarketplaceService
 from src.services.stories_service import StoriesService
 from src.cache.database import init_database
 from src.cache.cache_service import CacheService
+from src.cache.async_cache import AsyncCacheService
+from src.core.cache_manager import CacheManager
 from src.cache.refresh_tasks import RefreshTasks
 from src.cache.scheduler import CacheScheduler
 from src.scraper.session_keeper import SessionKeeper
@@ -30,7 +35,18 @@ selector_manager = SelectorManager()
 
 # Initialize cache
 cache_engine = init_database(settings.CACHE_DB_PATH)
-cache_service = CacheService(cache_engine)
+# Queries run on DB worker threads so SQLite never blocks the event loop;
+# hot reads are answered from the in-process L1
+cache_l1 = None
+if settings.CACHE_L1_ENABLED:
+    cache_l1 = CacheManager(max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                            max_bytes=settings.CACHE_L1_MAX_MB * 1024 * 1024,
+                            policy=settings.CACHE_L1_POLICY)
+cache_service = AsyncCacheService(CacheService(cache_engine), max_workers=settings.CACHE_DB_THREADS,
+                                  l1=cache_l1, l1_ttl=settings.CACHE_L1_TTL)
+# Pre-rendered response bodies are rebuilt whenever their data is written
+response_cache.max_entries = settings.RESPONSE_CACHE_MAX_ENTRIES
+cache_service.on_write(response_cache.invalidate)
 cache_scheduler = None
 session_keeper = None
 
@@ -39,39 +55,42 @@ async def lifespan(app: FastAPI):
     global cache_scheduler, session_keeper
     
     # Startup
+    await media.media_fetcher.start()
+    if cache_l1:
+        cache_l1.start_sweeper(settings.CACHE_L1_SWEEP_INTERVAL)
     await session_manager.start()
     posts.set_session_manager(session_manager)
     
-    # Initialize services
-    profile_service = ProfileService(session_manager.page, preflight_checker, selector_manager)
+    # Initialize services (each call runs on its own leased page)
+    profile_service = LeasedService(session_manager, ProfileService, preflight_checker, selector_manager)
     profile.set_profile_service(profile_service)
     
-    friends_service = FriendsService(session_manager.page, preflight_checker, selector_manager)
+    friends_service = LeasedService(session_manager, FriendsService, preflight_checker, selector_manager)
     friends.set_friends_service(friends_service)
     
-    posts_service = PostsService(session_manager.page, preflight_checker, selector_manager)
+    posts_service = LeasedService(session_manager, PostsService, preflight_checker, selector_manager)
     posts.set_posts_service(posts_service)
     
-    groups_service = GroupsService(session_manager.page, preflight_checker, selector_manager)
+    groups_service = LeasedService(session_manager, GroupsService, preflight_checker, selector_manager)
     groups.set_groups_service(groups_service)
     
-    messages_service = MessagesService(session_manager.page, preflight_checker, selector_manager)
+    messages_service = LeasedService(session_manager, MessagesService, preflight_checker, selector_manager)
     messages.set_messages_service(messages_service)
     
-    search_service = SearchService(session_manager.page)
+    search_service = LeasedService(session_manager, SearchService)
     search.set_search_service(search_service)
     
     # Initialize new services
-    events_service = EventsService(session_manager.page)
+    events_service = LeasedService(session_manager, EventsService)
     events.set_events_service(events_service)
     
-    pages_service = PagesService(session_manager.page)
+    pages_service = LeasedService(session_manager, PagesService)
     pages.set_pages_service(pages_service)
     
-    marketplace_service = MarketplaceService(session_manager.page)
+    marketplace_service = LeasedService(session_manager, MarketplaceService)
     marketplace.set_marketplace_service(marketplace_service)
     
-    stories_service = StoriesService(session_manager.page)
+    stories_service = LeasedService(session_manager, StoriesService)
     stories.set_stories_service(stories_service)
     
     # Set session manager for auth
@@ -91,6 +110,9 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 print(f"Auto-login failed: {e}")
     
+    # Pre-open pooled pages now that the session cookies are in place
+    await session_manager.get_pool()
+    
     # Disable cache scheduler to prevent page conflicts
     # Disable cache scheduler to prevent page conflicts
     # if settings.CACHE_ENABLED:
@@ -116,12 +138,17 @@ async def lifespan(app: FastAPI):
     # if cache_scheduler:
     #     cache_scheduler.stop()
     await session_manager.stop()
+    if cache_l1:
+        cache_l1.stop_sweeper()
+    await media.media_fetcher.close()
+    cache_service.close()
 
 app = FastAPI(
     title="Facebook API",
     description="Full Facebook automation API",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 app.add_middleware(
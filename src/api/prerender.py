@@ -0,0 +1,129 @@
+"""Pre-rendered response bodies for hot cached endpoints"""
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from fastapi import Request, Response
+from src.api.conditional import not_modified
+from src.api.responses import available_encodings, compress, dumps, pick_encoding
+from src.cache.revalidator import set_staleness_headers
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RenderedResponse:
+    """Final response bytes for one query shape, in every content coding"""
+    read: Any  # CacheRead the body was rendered from
+    bodies: Dict[str, bytes]  # 'identity', 'gzip', 'br'
+    variant: Tuple = field(default_factory=tuple)  # extra ETag input, e.g. a limit
+
+    @classmethod
+    def build(cls, read, content: Any, *variant, precompress: bool = True) -> "RenderedResponse":
+        """Render content; without precompress, codings are produced when first served"""
+        body = dumps(content)
+        bodies = {'identity': body}
+        if precompress and pick_encoding('gzip, br', len(body)):
+            for encoding in available_encodings():
+                bodies[encoding] = compress(body, encoding)
+        return cls(read=read, bodies=bodies, variant=variant)
+
+    def usable(self) -> bool:
+        """Only fresh reads are pre-rendered, and only until their rows expire"""
+        return self.read.expires_at is not None and datetime.utcnow() < self.read.expires_at
+
+    def serve(self, request: Request) -> Response:
+        response = Response(media_type="application/json")
+        set_staleness_headers(response, self.read)
+        unchanged = not_modified(request, response, self.read, *self.variant)
+        if unchanged:
+            return unchanged
+
+        encoding = pick_encoding(request.headers.get("accept-encoding", ""), len(self.bodies['identity']))
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            if encoding not in self.bodies:
+                self.bodies[encoding] = compress(self.bodies['identity'], encoding)
+            headers["Content-Encoding"] = encoding
+            body = self.bodies[encoding]
+        else:
+            body = self.bodies['identity']
+        return Response(content=body, headers=headers, media_type="application/json")
+
+
+Renderer = Callable[[], Awaitable[Optional[RenderedResponse]]]
+
+
+class ResponseCache:
+    """Bounded LRU of RenderedResponses keyed by (family, *query shape)
+
+    A hit costs one dict lookup. When a cache write lands for a family,
+    that family's bodies are dropped and re-rendered in the background, so
+    the next request for a shape that was hot is a hit again.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[RenderedResponse, Renderer]]" = OrderedDict()
+        # Bumped on every write so renders that raced it aren't stored
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    async def get_or_render(self, key: Tuple, render: Renderer) -> Optional[RenderedResponse]:
+        """Pre-rendered body for key, rendering it now on a miss; None if nothing to render
+
+        A render of stale data is returned for this request but not kept.
+        """
+        entry = self._entries.get(key)
+        if entry and entry[0].usable():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        return await self._render(key, render)
+
+    def invalidate(self, family: str):
+        """Drop a family's bodies after a write and re-render the shapes that were cached"""
+        self._generations[family] += 1
+        keys = [k for k in self._entries if k[0] == family]
+        for key in keys:
+            render = self._entries.pop(key)[1]
+            task = asyncio.create_task(self._render(key, render))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _render(self, key: Tuple, render: Renderer) -> Optional[RenderedResponse]:
+        generation = self._generations[key[0]]
+        try:
+            rendered = await render()
+        except Exception as e:
+            logger.error(f"Pre-rendering {key} failed: {e}")
+            return None
+        self.renders += 1
+
+        if rendered and rendered.usable() and generation == self._generations[key[0]]:
+            self._entries[key] = (rendered, render)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': sum(sum(len(b) for b in r.bodies.values()) for r, _ in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'renders': self.renders,
+        }
+
+
+# Global pre-rendered response cache
+response_cache = ResponseCache()
@@ -0,0 +1,84 @@
+"""Fast JSON rendering and response compression"""
+import gzip
+import json
+from typing import Any, Dict, List, Optional
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(request: Request, content: Any, headers: Optional[Dict] = None,
+                  status_code: int = 200) -> Response:
+    """Send trusted data (e.g. straight from our cache) without re-validation
+
+    Skips response_model validation and jsonable_encoder, and compresses
+    the body when it is large enough and the client accepts it.
+    """
+    headers = {k: v for k, v in (headers or {}).items() if k.lower() != "content-length"}
+    body = dumps(content)
+
+    encoding = pick_encoding(request.headers.get("accept-encoding", ""), len(body))
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept-Encoding"
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def available_encodings() -> List[str]:
+    """Content codings this server can produce, best first"""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+
+def pick_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    """Best encoding the client accepts, or None for small bodies"""
+    if size < settings.RESPONSE_COMPRESS_MIN_BYTES:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+
+    for encoding in available_encodings():
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
@@ -4,6 +4,7 @@ Cache management API routes.
 from fastapi import APIRouter, HTTPException
 from typing import Dict
 import logging
+from src.api.prerender import response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +34,7 @@ async def get_cache_status() -> Dict:
     
     status = {}
     for key in ['posts', 'friends', 'profile', 'requests']:
-        meta = cache_service.get_metadata(key)
+        meta = await cache_service.get_metadata(key)
         if meta:
             status[key] = {
                 'last_fetch': meta['last_fetch'].isoformat() if meta['last_fetch'] else None,
@@ -44,6 +45,8 @@ async def get_cache_status() -> Dict:
         else:
             status[key] = {'status': 'not_initialized'}
     
+    status['tiers'] = cache_service.tier_stats()
+    status['tiers']['prerendered'] = response_cache.stats()
     return status
 
 
@@ -74,9 +77,10 @@ async def clear_cache() -> Dict:
         raise HTTPException(status_code=503, detail="Cache service not initialized")
     
     # Clear all caches by setting empty data with 0 expiry
-    cache_service.set_posts([], 0)
-    cache_service.set_friends([], 0)
-    cache_service.set_profile({'name': None, 'bio': None, 'url': None}, 0)
-    cache_service.set_friend_requests([], 0)
+    await cache_service.set_posts([], 0)
+    await cache_service.set_friends([], 0)
+    await cache_service.set_profile({'name': None, 'bio': None, 'url': None}, 0)
+    await cache_service.set_friend_requests([], 0)
+    await cache_service.clear_watermarks()
     
     return {'success': True, 'message': 'Cache cleared'}
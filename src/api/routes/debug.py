@@ -19,3 +19,9 @@ async def get_profile_html(username: str):
     
     html = await session_manager.page.content()
     return html
+
+@router.get("/lean-stats")
+async def get_lean_stats():
+    """Requests blocked by lean scraping mode and the load time it saved"""
+    from src.scraper.resource_blocker import lean_stats
+    return lean_stats.summary()
@@ -1,9 +1,14 @@
 """
 Friends API routes.
 """
-from fastapi import APIRouter, HTTPException, Query, Response
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List, Optional
 from ..models import FriendData, FriendRequestData, FriendActionResponse
+from src.cache.revalidator import revalidator, set_staleness_headers
+from src.api.conditional import not_modified
+from src.api.responses import json_response
+from src.api.prerender import RenderedResponse, response_cache
+from config.settings import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -41,15 +46,25 @@ async def search_friends(q: str = Query(..., description="Search query"), limit:
 
 
 @router.get("/list", response_model=List[FriendData])
-async def get_friends_list(response: Response, limit: int = 50, fresh: bool = Query(False)):
+async def get_friends_list(request: Request, response: Response, limit: int = 50, fresh: bool = Query(False)):
     """Get list of friends."""
     
     # Try cache first
     if cache_service and not fresh:
-        cached_friends = cache_service.get_friends()
+        rendered = await response_cache.get_or_render(('friends', limit), lambda: _render_friends(limit))
+        if rendered:
+            return rendered.serve(request)
+        
+        cached_friends = await cache_service.read_friends(allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
         if cached_friends:
-            response.headers["X-Cache-Hit"] = "true"
-            return cached_friends[:limit]
+            if cached_friends.stale:
+                revalidator.trigger('friends', _refresh_friends)
+            set_staleness_headers(response, cached_friends)
+            unchanged = not_modified(request, response, cached_friends, limit)
+            if unchanged:
+                return unchanged
+            # Cached rows are already in FriendData shape; skip re-validation
+            return json_response(request, cached_friends.data[:limit], response.headers)
     
     response.headers["X-Cache-Hit"] = "false"
     
@@ -65,15 +80,20 @@ async def get_friends_list(response: Response, limit: int = 50, fresh: bool = Qu
 
 
 @router.get("/requests", response_model=List[FriendData])
-async def get_friend_requests(response: Response, fresh: bool = Query(False)):
+async def get_friend_requests(request: Request, response: Response, fresh: bool = Query(False)):
     """Get friend requests."""
     
     # Try cache first
     if cache_service and not fresh:
-        cached_requests = cache_service.get_friend_requests()
+        cached_requests = await cache_service.read_friend_requests(allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
         if cached_requests:
-            response.headers["X-Cache-Hit"] = "true"
-            return cached_requests
+            if cached_requests.stale:
+                revalidator.trigger('requests', _refresh_friend_requests)
+            set_staleness_headers(response, cached_requests)
+            unchanged = not_modified(request, response, cached_requests)
+            if unchanged:
+                return unchanged
+            return json_response(request, cached_requests.data, response.headers)
     
     response.headers["X-Cache-Hit"] = "false"
     
@@ -88,6 +108,30 @@ async def get_friend_requests(response: Response, fresh: bool = Query(False)):
     return result.get('data', [])
 
 
+async def _render_friends(limit: int) -> Optional[RenderedResponse]:
+    """Pre-render the cached friends list; None when the cache has nothing fresh"""
+    read = await cache_service.read_friends(allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
+    if not read or read.stale:
+        return None
+    return RenderedResponse.build(read, read.data[:limit], limit)
+
+
+async def _refresh_friends():
+    """Rescrape the friends list into the cache"""
+    result = await friends_service.get_friends_list(limit=50)
+    if not result['success']:
+        raise Exception(result.get('error', 'Failed to get friends'))
+    await cache_service.set_friends(result['data'], settings.CACHE_EXPIRY_FRIENDS)
+
+
+async def _refresh_friend_requests():
+    """Rescrape friend requests into the cache"""
+    result = await friends_service.get_friend_requests()
+    if not result['success']:
+        raise Exception(result.get('error', 'Failed to get requests'))
+    await cache_service.set_friend_requests(result.get('data', []), settings.CACHE_EXPIRY_REQUESTS)
+
+
 @router.post("/request", response_model=FriendActionResponse)
 async def send_friend_request(request: FriendRequestData):
     """Send friend request."""
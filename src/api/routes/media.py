@@ -1,42 +1,119 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
-import httpx
-import hashlib
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Dict, List, Optional
 from pathlib import Path
+from src.api.file_responses import serve_file
+from src.cache.media_fetcher import MediaFetcher
+from src.cache.media_store import MediaStore
+from src.cache.media_variants import FORMATS, VariantStore, normalize_format, source_format
+from src.scraper.image_capture import ImageCapture
+from config.settings import settings
 
 router = APIRouter(prefix="/media", tags=["media"])
 
 # Image cache directory
-CACHE_DIR = Path("image_cache")
+CACHE_DIR = Path(settings.MEDIA_CACHE_DIR)
 CACHE_DIR.mkdir(exist_ok=True)
 
+# Images keyed by content hash, indexed by URL in the cache database
+media_store = MediaStore(CACHE_DIR, max_bytes=settings.MEDIA_CACHE_MAX_MB * 1024 * 1024,
+                         flush_after=settings.MEDIA_ACCESS_FLUSH_AFTER)
+
+# Shared downloader (one pooled client for all image fetches)
+media_fetcher = MediaFetcher(
+    media_store,
+    concurrency=settings.MEDIA_FETCH_CONCURRENCY,
+    per_host=settings.MEDIA_FETCH_PER_HOST,
+    queue_size=settings.MEDIA_PREFETCH_QUEUE,
+    timeout=settings.MEDIA_FETCH_TIMEOUT,
+    http2=settings.MEDIA_HTTP2,
+    flush_interval=settings.MEDIA_ACCESS_FLUSH_INTERVAL
+)
+
+# Thumbnails / re-encodes, generated once and kept beside the originals
+media_variants = VariantStore(
+    quality=settings.MEDIA_VARIANT_QUALITY,
+    max_dimension=settings.MEDIA_VARIANT_MAX_DIMENSION,
+    on_render=media_store.add_variant_bytes
+)
+
 async def fetch_and_cache_image(url: str) -> str:
     """Fetch image from URL and cache it locally. Returns cache key."""
-    cache_key = hashlib.md5(url.encode()).hexdigest()
-    cache_path = CACHE_DIR / f"{cache_key}.jpg"
-    
-    # If already cached, return key
-    if cache_path.exists():
-        return cache_key
-    
-    # Fetch and cache
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, follow_redirects=True, timeout=10.0)
-            if response.status_code == 200:
-                cache_path.write_bytes(response.content)
-                return cache_key
+        return await media_fetcher.fetch(url)
     except:
-        pass
-    
-    return None
+        return None
+
+def new_capture() -> Optional[ImageCapture]:
+    """An ImageCapture for one scrape, or None unless MEDIA_CAPTURE is on"""
+    if not settings.MEDIA_CAPTURE:
+        return None
+    return ImageCapture(settings.MEDIA_CAPTURE_MAX_MB * 1024 * 1024)
+
+def post_image_urls(posts: List[Dict]) -> List[str]:
+    """Image URLs referenced by posts, in order, without duplicates"""
+    urls = []
+    for post in posts:
+        for url in [post.get('image_url')] + (post.get('media') or {}).get('images', []):
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+def prefetch_images(posts: List[Dict]) -> int:
+    """Queue the posts' images for background download. Returns how many were queued."""
+    return sum(1 for url in post_image_urls(posts) if media_fetcher.prefetch(url))
+
+async def store_captured(capture: ImageCapture, posts: List[Dict]) -> int:
+    """Write the captured bodies of the posts' images into the media cache. Returns how many."""
+    captured = capture.take(post_image_urls(posts))
+    for url, (body, content_type) in captured.items():
+        await media_fetcher.put(url, body, content_type)
+    return len(captured)
 
 @router.get("/image/{cache_key}")
-async def get_cached_image(cache_key: str):
-    """Serve cached image"""
-    cache_path = CACHE_DIR / f"{cache_key}.jpg"
+async def get_cached_image(
+    cache_key: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=1, le=settings.MEDIA_VARIANT_MAX_DIMENSION, description="Max width"),
+    h: Optional[int] = Query(None, ge=1, le=settings.MEDIA_VARIANT_MAX_DIMENSION, description="Max height"),
+    format: Optional[str] = Query(None, description="jpeg, webp or png")
+):
+    """Serve cached image (cacheable forever; supports Range and conditional GET)
     
-    if not cache_path.exists():
+    With `w`/`h` the image is scaled down to fit that box, keeping its
+    format, and with `format` re-encoded. Each variant is generated once
+    and then served from disk. Without Pillow installed the original is
+    served.
+    """
+    stored = await asyncio.to_thread(media_store.lookup, cache_key, True)
+    
+    if not stored:
         raise HTTPException(status_code=404, detail="Image not found")
+    cache_path, media_type, content_hash = stored
     
-    return Response(content=cache_path.read_bytes(), media_type="image/jpeg")
+    try:
+        fmt = normalize_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    etag_key = content_hash
+    if (w or h or fmt) and media_variants.enabled:
+        fmt = fmt or source_format(media_type)
+        try:
+            cache_path = await media_variants.get(cache_path, w, h, fmt)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not convert image: {e}")
+        media_type = FORMATS[fmt][2]
+        # Variant files are named `<content_hash>_<w>x<h>.<ext>`
+        etag_key = cache_path.name
+    
+    return await serve_file(request, cache_path, media_type, settings.MEDIA_MAX_AGE, etag_key)
+
+@router.get("/stats")
+async def get_media_stats() -> Dict:
+    """Image download counters and throughput (images/s), plus store size and quota"""
+    return {
+        **media_fetcher.stats(),
+        'store': await asyncio.to_thread(media_store.stats),
+        'variants': media_variants.stats()
+    }
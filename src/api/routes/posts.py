@@ -1,12 +1,28 @@
-from fastapi import APIRouter, Query, HTTPException
+import json
+import logging
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from src.scraper.session_manager import SessionManager
 from src.scraper.feed_aggregator import FeedAggregator
+from src.core.single_flight import SingleFlight
+from src.cache.revalidator import revalidator, set_staleness_headers
+from src.api.conditional import not_modified
+from src.api.responses import json_response
+from src.api.prerender import RenderedResponse, response_cache
+from src.api.routes.media import new_capture, prefetch_images, store_captured
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 session_manager: SessionManager = None
 posts_service = None
 cache_service = None
 
+# Identical fresh scrapes in flight at the same time share one browser run
+scrape_flight = SingleFlight(window=settings.SCRAPE_COALESCE_WINDOW)
+
 def set_session_manager(sm: SessionManager):
     global session_manager
     session_manager = sm
@@ -19,28 +35,8 @@ def set_cache_service(service):
     global cache_service
     cache_service = service
 
-@router.get("/feed")
-async def get_posts(
-    limit: int = Query(20, ge=1, le=100),
-    friends: str = Query("", description="Comma-separated friend profile URLs"),
-    fresh: bool = Query(False, description="Force fresh scrape, bypass cache")
-):
-    """Extract posts from friends using GraphQL interception with caching"""
-    
-    if not session_manager or not session_manager.page:
-        raise HTTPException(status_code=503, detail="Browser not ready")
-    
-    # Try cache first unless fresh is requested
-    if cache_service and not fresh:
-        cached = cache_service.get_posts(limit=limit)
-        if cached and len(cached) > 0:
-            return {
-                "count": len(cached),
-                "posts": cached,
-                "cached": True
-            }
-    
-    # Parse friends list
+def _parse_friends(friends: str) -> List[Dict]:
+    """Turn comma-separated profile URLs into friend dicts"""
     friend_list = []
     if friends:
         for url in friends.split(','):
@@ -51,29 +47,58 @@ async def get_posts(
     else:
         # Default test friend
         friend_list = [{'name': 'Mark Retallack', 'url': 'https://www.facebook.com/mark.retallack'}]
+    return friend_list
+
+async def _store_post(post: Dict):
+    """Write a scraped post to the cache"""
+    await cache_service.store_post(
+        post_id=post['id'],
+        author_name=post['author']['name'],
+        author_url=post['author']['profile_url'],
+        content=post['content'],
+        url=post['url'],
+        timestamp=post.get('timestamp', ''),
+        image_url=post.get('image_url'),
+        source_type='friend'
+    )
+
+@router.get("/feed")
+async def get_posts(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    friends: str = Query("", description="Comma-separated friend profile URLs"),
+    fresh: bool = Query(False, description="Force fresh scrape, bypass cache"),
+    before: str = Query(None, description="Cursor: page of posts older than this (next_cursor)"),
+    after: str = Query(None, description="Cursor: page of posts newer than this (prev_cursor)"),
+    author: str = Query(None, description="Only cached posts by this profile URL"),
+    source_type: str = Query(None, pattern="^(friend|following)$", description="Only cached posts of this source")
+):
+    """Extract posts from friends using GraphQL interception with caching
     
-    # Scrape fresh posts
-    aggregator = FeedAggregator(session_manager.page, session_manager)
-    posts = await aggregator.get_feed(friend_list, [], limit=limit, include_own_profile=False)
+    With before/after/author/source_type the request pages through cached posts only.
+    """
     
-    # Store in cache
-    if cache_service and posts:
-        print(f"[DEBUG] Storing {len(posts)} posts in cache")
-        for post in posts:
-            print(f"[DEBUG] Storing post: {post['id'][:50]}...")
-            cache_service.store_post(
-                post_id=post['id'],
-                author_name=post['author']['name'],
-                author_url=post['author']['profile_url'],
-                content=post['content'],
-                url=post['url'],
-                timestamp=post.get('timestamp', ''),
-                image_url=post.get('image_url'),
-                source_type='friend'
-            )
-        print(f"[DEBUG] Finished storing posts")
-    else:
-        print(f"[DEBUG] Not storing: cache_service={cache_service is not None}, posts={len(posts) if posts else 0}")
+    if before or after or author or source_type:
+        return await _cached_page(request, response, limit, before, after, author, source_type)
+    
+    if not session_manager or not session_manager.page:
+        raise HTTPException(status_code=503, detail="Browser not ready")
+    
+    friend_list = _parse_friends(friends)
+    
+    # Try cache first unless fresh is requested
+    if cache_service and not fresh:
+        rendered = await response_cache.get_or_render(('posts', limit, None, None),
+                                                      lambda: _render_posts(limit, None, None))
+        if rendered:
+            # Serve stale posts now, rescrape in the background
+            if rendered.read.stale:
+                revalidator.trigger('posts', lambda: _coalesced_scrape(friend_list, limit, incremental=True))
+            return rendered.serve(request)
+    
+    # Scrape fresh posts (shared with identical concurrent requests)
+    posts = await _coalesced_scrape(friend_list, limit, incremental=False)
     
     return {
         "count": len(posts),
@@ -81,46 +106,190 @@ async def get_posts(
         "cached": False
     }
 
+async def _cached_page(request: Request, response: Response, limit: int, before: str, after: str,
+                       author: str, source_type: str) -> Dict:
+    """Keyset-paginated page of cached posts"""
+    if not cache_service:
+        raise HTTPException(status_code=503, detail="Cache not available")
+    
+    empty = {"count": 0, "posts": [], "cached": True, "next_cursor": None, "prev_cursor": None}
+    
+    # First pages are common enough to pre-render
+    if not before and not after:
+        rendered = await response_cache.get_or_render(('posts', limit, source_type, author),
+                                                      lambda: _render_posts(limit, source_type, author))
+        return rendered.serve(request) if rendered else empty
+    
+    try:
+        page = await cache_service.read_posts(limit=limit, source_type=source_type,
+                                              allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE,
+                                              author=author, before=before, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not page:
+        return empty
+    
+    set_staleness_headers(response, page)
+    unchanged = not_modified(request, response, page)
+    if unchanged:
+        return unchanged
+    return json_response(request, _posts_body(page), response.headers)
+
+async def _render_posts(limit: int, source_type: Optional[str], author: Optional[str]) -> Optional[RenderedResponse]:
+    """Render a first page of cached posts; None when the cache has none
+    
+    Stale pages are rendered too, so the caller serves them without a second
+    read; they aren't kept (see RenderedResponse.usable) or precompressed.
+    """
+    read = await cache_service.read_posts(limit=limit, source_type=source_type, author=author,
+                                          allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
+    if not read:
+        return None
+    return RenderedResponse.build(read, _posts_body(read), precompress=not read.stale)
+
+def _posts_body(read) -> Dict:
+    # Freshness (stale, age) changes by the second, so it goes in the
+    # X-Cache-Stale / Age headers, never in a body that may be pre-rendered
+    return {
+        "count": len(read.data),
+        "posts": read.data,
+        "cached": True,
+        "next_cursor": read.next_cursor,
+        "prev_cursor": read.prev_cursor
+    }
+
+@router.get("/search")
+async def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Words to find; end a word with * to match it as a prefix"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Full-text search over every cached post (content and author name), best match first"""
+    if not cache_service:
+        raise HTTPException(status_code=503, detail="Cache not available")
+    
+    try:
+        found = await cache_service.search_posts(q, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Post search failed: {e}")
+        raise HTTPException(status_code=503, detail="Search unavailable")
+    
+    return json_response(request, {
+        "query": q,
+        "count": len(found['results']),
+        "results": found['results'],
+        "next_offset": found['next_offset']
+    })
+
 @router.post("/feed/refresh")
 async def refresh_feed(
     friends: str = Query("", description="Comma-separated friend profile URLs"),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    incremental: bool = Query(True, description="Only fetch posts newer than the cached ones")
 ):
     """Refresh feed cache in background - call this periodically"""
     
     if not session_manager or not session_manager.page:
         raise HTTPException(status_code=503, detail="Browser not ready")
     
-    # Parse friends list
-    friend_list = []
-    if friends:
-        for url in friends.split(','):
-            url = url.strip()
-            if url:
-                name = url.split('/')[-1].replace('.', ' ').title()
-                friend_list.append({'name': name, 'url': url})
-    else:
-        friend_list = [{'name': 'Mark Retallack', 'url': 'https://www.facebook.com/mark.retallack'}]
-    
-    # Scrape and cache
-    aggregator = FeedAggregator(session_manager.page, session_manager)
-    posts = await aggregator.get_feed(friend_list, [], limit=limit, include_own_profile=False)
-    
-    if cache_service and posts:
-        for post in posts:
-            cache_service.store_post(
-                post_id=post['id'],
-                author_name=post['author']['name'],
-                author_url=post['author']['profile_url'],
-                content=post['content'],
-                url=post['url'],
-                timestamp=post.get('timestamp', ''),
-                image_url=post.get('image_url'),
-                source_type='friend'
-            )
+    friend_list = _parse_friends(friends)
+    posts = await _coalesced_scrape(friend_list, limit, incremental=incremental)
     
     return {
         "status": "refreshed",
         "count": len(posts),
         "cached": True
     }
+
+async def _coalesced_scrape(friend_list: List[Dict], limit: int, incremental: bool) -> List[Dict]:
+    """Scrape and cache the feed, joining an identical scrape already in flight"""
+    key = (
+        'feed',
+        session_manager.current_account or 'default',
+        frozenset(f['url'] for f in friend_list),
+        limit,
+        incremental
+    )
+    return await scrape_flight.do(key, lambda: _scrape_feed(friend_list, limit, incremental))
+
+async def _scrape_feed(friend_list: List[Dict], limit: int, incremental: bool) -> List[Dict]:
+    """Scrape friends' posts and write them to the cache"""
+    # Newest cached post per friend, so the scrape can stop there
+    watermarks = None
+    if cache_service and incremental:
+        watermarks = await cache_service.get_watermarks([f['url'] for f in friend_list])
+    
+    capture = new_capture()
+    async with session_manager.lease() as page:
+        aggregator = FeedAggregator(page, session_manager, capture=capture)
+        posts = await aggregator.get_feed(friend_list, [], limit=limit, include_own_profile=False,
+                                          watermarks=watermarks)
+    
+    # Posts older than the watermarks were not re-fetched; keep them alive
+    if cache_service and watermarks:
+        await cache_service.touch_posts(list(watermarks.keys()))
+    
+    # Store in cache (one transaction for the whole batch)
+    if cache_service and posts:
+        logger.debug(f"Storing {len(posts)} posts in cache")
+        await cache_service.upsert_posts(posts, source_type='friend')
+        await cache_service.set_watermarks(aggregator.newest_urls)
+        if capture:
+            await store_captured(capture, posts)
+        prefetch_images(posts)
+    else:
+        logger.debug(f"Not storing: cache_service={cache_service is not None}, posts={len(posts) if posts else 0}")
+    
+    return posts
+
+@router.get("/feed/stream")
+async def stream_posts(
+    limit: int = Query(20, ge=1, le=100),
+    friends: str = Query("", description="Comma-separated friend profile URLs"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse")
+):
+    """Stream a fresh scrape: each post is sent (and cached) as soon as it is extracted
+    
+    Emits friend_start / post / friend_done progress events followed by a
+    final done or error event, as NDJSON lines or Server-Sent Events.
+    """
+    
+    if not session_manager or not session_manager.page:
+        raise HTTPException(status_code=503, detail="Browser not ready")
+    
+    friend_list = _parse_friends(friends)
+    
+    async def events():
+        capture = new_capture()
+        streamed = []
+        async with session_manager.lease() as page:
+            aggregator = FeedAggregator(page, session_manager, capture=capture)
+            async for event in aggregator.stream_feed(friend_list, limit=limit):
+                if event['event'] == 'post' and cache_service:
+                    await _store_post(event['post'])
+                    streamed.append(event['post'])
+                yield _format_event(event, format)
+            
+            if cache_service:
+                await cache_service.set_watermarks(aggregator.newest_urls)
+                if capture:
+                    await store_captured(capture, streamed)
+                prefetch_images(streamed)
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _format_event(event: Dict, format: str) -> str:
+    """Serialize a feed event as an NDJSON line or an SSE message"""
+    if format == "sse":
+        data = {k: v for k, v in event.items() if k != 'event'}
+        return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps(event) + "\n"
@@ -1,8 +1,14 @@
 """
 Profile API routes.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
 from ..models import ProfileData, ProfileUpdateRequest, ProfilePictureResponse
+from src.cache.revalidator import revalidator, set_staleness_headers
+from src.api.conditional import not_modified
+from src.api.responses import json_response
+from src.api.prerender import RenderedResponse, response_cache
+from config.settings import settings
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,15 +33,24 @@ def set_cache_service(service):
 
 
 @router.get("/me", response_model=ProfileData)
-async def get_profile(response: Response, fresh: bool = Query(False)):
+async def get_profile(request: Request, response: Response, fresh: bool = Query(False)):
     """Get current user's profile information."""
     
     # Try cache first
     if cache_service and not fresh:
-        cached_profile = cache_service.get_profile()
+        rendered = await response_cache.get_or_render(('profile',), _render_profile)
+        if rendered:
+            return rendered.serve(request)
+        
+        cached_profile = await cache_service.read_profile(allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
         if cached_profile:
-            response.headers["X-Cache-Hit"] = "true"
-            return cached_profile
+            if cached_profile.stale:
+                revalidator.trigger('profile', _refresh_profile)
+            set_staleness_headers(response, cached_profile)
+            unchanged = not_modified(request, response, cached_profile)
+            if unchanged:
+                return unchanged
+            return json_response(request, cached_profile.data, response.headers)
     
     response.headers["X-Cache-Hit"] = "false"
     
@@ -50,6 +65,22 @@ async def get_profile(response: Response, fresh: bool = Query(False)):
     return result['data']
 
 
+async def _render_profile() -> Optional[RenderedResponse]:
+    """Pre-render the cached profile; None when the cache has nothing fresh"""
+    read = await cache_service.read_profile(allow_stale=settings.CACHE_STALE_WHILE_REVALIDATE)
+    if not read or read.stale:
+        return None
+    return RenderedResponse.build(read, read.data)
+
+
+async def _refresh_profile():
+    """Rescrape the profile into the cache"""
+    result = await profile_service.get_profile()
+    if not result['success']:
+        raise Exception(result.get('error', 'Failed to get profile'))
+    await cache_service.set_profile(result['data'], settings.CACHE_EXPIRY_PROFILE)
+
+
 @router.put("/me", response_model=ProfileData)
 async def update_profile(request: ProfileUpdateRequest):
     """Update profile information."""
@@ -0,0 +1,120 @@
+"""Async front for CacheService that keeps SQLite off the event loop"""
+import asyncio
+import functools
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+from src.cache.cache_service import CacheService
+from src.core.cache_manager import CacheManager
+
+# Reads served from the in-process L1, by the data family they return
+READ_FAMILIES = {
+    'read_posts': 'posts',
+    'read_friends': 'friends',
+    'read_profile': 'profile',
+    'read_friend_requests': 'requests',
+}
+
+# Writes and the family of L1 entries each one invalidates
+WRITE_FAMILIES = {
+    'set_posts': 'posts',
+    'store_post': 'posts',
+    'upsert_posts': 'posts',
+    'touch_posts': 'posts',
+    'set_friends': 'friends',
+    'set_profile': 'profile',
+    'set_friend_requests': 'requests',
+}
+
+
+class AsyncCacheService:
+    """Run CacheService methods on a dedicated DB thread pool
+
+    Every public CacheService method is exposed as a coroutine with the same
+    signature: `await cache.read_posts(limit=20)`. Queries run on worker
+    threads, so Playwright callbacks and other requests keep being served
+    while SQLite works.
+
+    With an `l1` CacheManager, read_* results are also kept in memory for up
+    to `l1_ttl` seconds (never past the rows' own expiry) and dropped as soon
+    as a write to the same family completes.
+    """
+
+    def __init__(self, cache_service: CacheService, max_workers: int = 4,
+                 l1: CacheManager = None, l1_ttl: int = 30):
+        self.sync = cache_service
+        self.l1 = l1
+        self.l1_ttl = l1_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cache-db")
+        # Bumped after every write so reads that raced it don't repopulate the L1
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._write_listeners: List[Callable[[str], None]] = []
+        self.l2_hits = 0
+        self.l2_misses = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name, None)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(f"CacheService has no method {name}")
+
+        if self.l1 and name in READ_FAMILIES:
+            return functools.partial(self._read_through, READ_FAMILIES[name], name, method)
+        if name in WRITE_FAMILIES:
+            return functools.partial(self._write_through, WRITE_FAMILIES[name], method)
+        return functools.partial(self._run, method)
+
+    async def _run(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def _read_through(self, family: str, name: str, method, *args, **kwargs):
+        key = f"{family}:{name}:{args!r}:{sorted(kwargs.items())!r}"
+        read = await self.l1.get(key)
+        if read is not None:
+            return read
+
+        generation = self._generations[family]
+        read = await self._run(method, *args, **kwargs)
+        if read is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+
+        ttl = self.l1_ttl
+        if not read.stale and read.expires_at:
+            # Expire from L1 no later than the rows turn stale
+            ttl = min(ttl, (read.expires_at - datetime.utcnow()).total_seconds())
+        if ttl > 0 and generation == self._generations[family]:
+            await self.l1.set(key, read, ttl)
+        return read
+
+    async def _write_through(self, family: str, method, *args, **kwargs):
+        try:
+            return await self._run(method, *args, **kwargs)
+        finally:
+            self._generations[family] += 1
+            if self.l1:
+                await self.l1.delete_prefix(f"{family}:")
+            for listener in self._write_listeners:
+                listener(family)
+
+    def on_write(self, listener: Callable[[str], None]):
+        """Call listener(family) after every write, e.g. to rebuild derived caches"""
+        self._write_listeners.append(listener)
+
+    def tier_stats(self) -> Dict:
+        """Hit/miss counters for the memory (L1) and SQLite (L2) tiers"""
+        l2_lookups = self.l2_hits + self.l2_misses
+        return {
+            'l1': self.l1.stats() if self.l1 else None,
+            'l2': {
+                'hits': self.l2_hits,
+                'misses': self.l2_misses,
+                'hit_rate': round(self.l2_hits / l2_lookups, 3) if l2_lookups else None
+            }
+        }
+
+    def close(self):
+        """Wait for queued queries and stop the worker threads"""
+        self._executor.shutdown(wait=True)
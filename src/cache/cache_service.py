@@ -1,12 +1,53 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
+import base64
+import hashlib
 import json
+import re
+from sqlalchemy import and_, or_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
+from config.settings import settings
 from src.cache.database import (
     CachedPost, CachedFriend, CachedFollowing, CachedProfile, 
-    CachedFriendRequest, CacheMetadata, get_session
+    CachedFriendRequest, CacheMetadata, FriendWatermark, get_session
 )
 
+@dataclass
+class CacheRead:
+    """Cached data plus how old it is (stale-while-revalidate reads)"""
+    data: Any
+    fetched_at: datetime
+    stale: bool
+    expires_at: Optional[datetime] = None  # earliest soft expiry among the rows
+    last_modified: Optional[datetime] = None  # newest fetched_at among the rows
+    version: Optional[str] = None  # changes whenever the rows' content does
+    next_cursor: Optional[str] = None  # older page
+    prev_cursor: Optional[str] = None  # newer page
+    
+    @property
+    def age_seconds(self) -> int:
+        return max(0, int((datetime.utcnow() - self.fetched_at).total_seconds()))
+
+def encode_cursor(first_seen_at: datetime, post_id: str) -> str:
+    """Opaque page cursor for a post's position in newest-first order"""
+    raw = json.dumps([first_seen_at.isoformat(), post_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        first_seen_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(first_seen_at), post_id
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+# Rows per multi-row INSERT (up to 19 columns each, SQLite allows 999 parameters on old builds)
+UPSERT_CHUNK_SIZE = 50
+# Keys per IN (...) list
+KEY_CHUNK_SIZE = 500
+
 class CacheService:
     def __init__(self, engine):
         self.engine = engine
@@ -16,59 +57,89 @@ class CacheService:
     
     # Posts
     def get_posts(self, limit: int = 20, source_type: str = None) -> Optional[List[Dict]]:
+        read = self.read_posts(limit, source_type, allow_stale=False)
+        return read.data if read else None
+    
+    def read_posts(self, limit: int = 20, source_type: str = None, allow_stale: bool = True,
+                   author: str = None, before: str = None, after: str = None) -> Optional[CacheRead]:
+        """One newest-first page of posts with its age
+        
+        With allow_stale, rows past the soft TTL are served (flagged stale)
+        until the hard TTL. `before`/`after` take the next_cursor/prev_cursor
+        of a previous page; paging seeks on (first_seen_at, id), so the cost is
+        the page size however deep the page is, and refreshes that run while
+        a client pages (they bump fetched_at) don't shift the pages.
+        """
         session = self._get_session()
         try:
             query = session.query(CachedPost).filter(
-                CachedPost.expires_at > datetime.utcnow()
+                self._usable(CachedPost, allow_stale, settings.CACHE_STALE_MAX_POSTS, settings.CACHE_EXPIRY_POSTS)
             )
             
             if source_type:
                 query = query.filter(CachedPost.source_type == source_type)
+            if author:
+                query = query.filter(CachedPost.author_url == author)
+            if before:
+                at, post_id = decode_cursor(before)
+                query = query.filter(CachedPost.first_seen_at <= at, or_(
+                    CachedPost.first_seen_at < at, and_(CachedPost.first_seen_at == at, CachedPost.id < post_id)
+                ))
+            if after:
+                at, post_id = decode_cursor(after)
+                query = query.filter(CachedPost.first_seen_at >= at, or_(
+                    CachedPost.first_seen_at > at, and_(CachedPost.first_seen_at == at, CachedPost.id > post_id)
+                ))
             
-            # Order by fetched_at descending to get newest first
-            query = query.order_by(CachedPost.fetched_at.desc())
-            
-            posts = query.limit(limit).all()
+            forward = after and not before
+            if forward:
+                # Walk up from the cursor, then flip back to newest first
+                query = query.order_by(CachedPost.first_seen_at.asc(), CachedPost.id.asc())
+            else:
+                query = query.order_by(CachedPost.first_seen_at.desc(), CachedPost.id.desc())
             
-            print(f"[CacheService] Query returned {len(posts)} posts (limit={limit}, source_type={source_type})")
+            # One extra row tells whether another page follows
+            posts = query.limit(limit + 1).all()
+            has_more = len(posts) > limit
+            posts = posts[:limit]
+            if forward:
+                posts.reverse()
             
             if not posts:
                 return None
             
             result = [self._post_to_dict(p) for p in posts]
-            print(f"[CacheService] Converted to {len(result)} dicts")
-            return result
+            read = self._cache_read(result, posts)
+            first, last = posts[0], posts[-1]
+            if forward or has_more:
+                read.next_cursor = encode_cursor(last.first_seen_at, last.id)
+            if (forward and has_more) or (not forward and (before or after)):
+                read.prev_cursor = encode_cursor(first.first_seen_at, first.id)
+            return read
         finally:
             session.close()
     
     def set_posts(self, posts: List[Dict], expiry_hours: int = 1):
         session = self._get_session()
         try:
-            # Clear old posts
-            session.query(CachedPost).delete()
-            
-            # Add new posts
-            expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-            for post in posts:
-                cached_post = CachedPost(
-                    id=post['id'],
-                    author_name=post['author']['name'],
-                    author_url=post['author']['profile_url'],
-                    content=post['content'],
-                    timestamp=post['timestamp'],
-                    post_type=post['post_type'],
-                    is_sponsored=post['is_sponsored'],
-                    is_suggested=post['is_suggested'],
-                    source_type=post.get('source_type', 'friend'),
-                    likes=post['engagement']['likes'],
-                    comments=post['engagement']['comments'],
-                    shares=post['engagement']['shares'],
-                    images=json.dumps(post['media']['images']),
-                    videos=json.dumps(post['media']['videos']),
-                    expires_at=expires_at
-                )
-                session.add(cached_post)
-            
+            rows = [{
+                'id': post['id'],
+                'author_name': post['author']['name'],
+                'author_url': post['author']['profile_url'],
+                'content': post['content'],
+                'url': post.get('url'),
+                'timestamp': post['timestamp'],
+                'post_type': post['post_type'],
+                'is_sponsored': post['is_sponsored'],
+                'is_suggested': post['is_suggested'],
+                'source_type': post.get('source_type', 'friend'),
+                'likes': post['engagement']['likes'],
+                'comments': post['engagement']['comments'],
+                'shares': post['engagement']['shares'],
+                'images': json.dumps(post['media']['images']),
+                'videos': json.dumps(post['media']['videos'])
+            } for post in posts]
+            self._merge(session, CachedPost, rows, expiry_hours)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -78,36 +149,35 @@ class CacheService:
     
     # Friends
     def get_friends(self) -> Optional[List[Dict]]:
+        read = self.read_friends(allow_stale=False)
+        return read.data if read else None
+    
+    def read_friends(self, allow_stale: bool = True) -> Optional[CacheRead]:
+        """Friends with their age; with allow_stale, served past the soft TTL (flagged stale) until the hard TTL"""
         session = self._get_session()
         try:
             friends = session.query(CachedFriend).filter(
-                CachedFriend.expires_at > datetime.utcnow()
+                self._usable(CachedFriend, allow_stale, settings.CACHE_STALE_MAX_FRIENDS, settings.CACHE_EXPIRY_FRIENDS)
             ).all()
             
             if not friends:
                 return None
             
-            return [self._friend_to_dict(f) for f in friends]
+            return self._cache_read([self._friend_to_dict(f) for f in friends], friends)
         finally:
             session.close()
     
     def set_friends(self, friends: List[Dict], expiry_hours: int = 4):
         session = self._get_session()
         try:
-            session.query(CachedFriend).delete()
-            
-            expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-            for friend in friends:
-                cached_friend = CachedFriend(
-                    id=friend.get('id', ''),
-                    name=friend['name'],
-                    url=friend['url'],
-                    mutual_friends=friend.get('mutual_friends', 0),
-                    profile_picture=friend.get('profile_picture', ''),
-                    expires_at=expires_at
-                )
-                session.add(cached_friend)
-            
+            rows = [{
+                'id': friend.get('id', ''),
+                'name': friend['name'],
+                'url': friend['url'],
+                'mutual_friends': friend.get('mutual_friends', 0),
+                'profile_picture': friend.get('profile_picture', '')
+            } for friend in friends]
+            self._merge(session, CachedFriend, rows, expiry_hours)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -117,37 +187,42 @@ class CacheService:
     
     # Profile
     def get_profile(self) -> Optional[Dict]:
+        read = self.read_profile(allow_stale=False)
+        return read.data if read else None
+    
+    def read_profile(self, allow_stale: bool = True) -> Optional[CacheRead]:
+        """Profile with its age; with allow_stale, served past the soft TTL (flagged stale) until the hard TTL"""
         session = self._get_session()
         try:
-            profile = session.query(CachedProfile).filter(
-                CachedProfile.expires_at > datetime.utcnow()
-            ).first()
+            query = session.query(CachedProfile).filter(
+                self._usable(CachedProfile, allow_stale, settings.CACHE_STALE_MAX_PROFILE, settings.CACHE_EXPIRY_PROFILE)
+            )
+            if allow_stale:
+                # /cache/clear leaves an empty, already-expired profile row behind
+                query = query.filter(CachedProfile.name.isnot(None))
+            profile = query.first()
             
             if not profile:
                 return None
             
-            return {
+            return self._cache_read({
                 'name': profile.name,
                 'bio': profile.bio,
                 'url': profile.url
-            }
+            }, [profile])
         finally:
             session.close()
     
     def set_profile(self, profile: Dict, expiry_hours: int = 8):
         session = self._get_session()
         try:
-            session.query(CachedProfile).delete()
-            
-            expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-            cached_profile = CachedProfile(
-                user_id='default',
-                name=profile.get('name'),
-                bio=profile.get('bio'),
-                url=profile.get('url'),
-                expires_at=expires_at
-            )
-            session.add(cached_profile)
+            row = {
+                'user_id': 'default',
+                'name': profile.get('name'),
+                'bio': profile.get('bio'),
+                'url': profile.get('url')
+            }
+            self._merge(session, CachedProfile, [row], expiry_hours)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -157,36 +232,35 @@ class CacheService:
     
     # Friend Requests
     def get_friend_requests(self) -> Optional[List[Dict]]:
+        read = self.read_friend_requests(allow_stale=False)
+        return read.data if read else None
+    
+    def read_friend_requests(self, allow_stale: bool = True) -> Optional[CacheRead]:
+        """Friend requests with their age; with allow_stale, served past the soft TTL (flagged stale) until the hard TTL"""
         session = self._get_session()
         try:
             requests = session.query(CachedFriendRequest).filter(
-                CachedFriendRequest.expires_at > datetime.utcnow()
+                self._usable(CachedFriendRequest, allow_stale, settings.CACHE_STALE_MAX_REQUESTS, settings.CACHE_EXPIRY_REQUESTS)
             ).all()
             
             if not requests:
                 return None
             
-            return [self._friend_to_dict(r) for r in requests]
+            return self._cache_read([self._friend_to_dict(r) for r in requests], requests)
         finally:
             session.close()
     
     def set_friend_requests(self, requests: List[Dict], expiry_hours: int = 2):
         session = self._get_session()
         try:
-            session.query(CachedFriendRequest).delete()
-            
-            expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-            for req in requests:
-                cached_req = CachedFriendRequest(
-                    id=req.get('id', ''),
-                    name=req['name'],
-                    url=req['url'],
-                    mutual_friends=req.get('mutual_friends', 0),
-                    profile_picture=req.get('profile_picture', ''),
-                    expires_at=expires_at
-                )
-                session.add(cached_req)
-            
+            rows = [{
+                'id': req.get('id', ''),
+                'name': req['name'],
+                'url': req['url'],
+                'mutual_friends': req.get('mutual_friends', 0),
+                'profile_picture': req.get('profile_picture', '')
+            } for req in requests]
+            self._merge(session, CachedFriendRequest, rows, expiry_hours)
             session.commit()
         except Exception as e:
             session.rollback()
@@ -237,52 +311,289 @@ class CacheService:
         finally:
             session.close()
     
+    def search_posts(self, query: str, limit: int = 20, offset: int = 0) -> Dict:
+        """Full-text search over every cached (non-tombstoned) post, best match first
+        
+        Words are matched in content and author name; a trailing * makes a
+        word a prefix (`hol*`). Returns the page of posts, each with its
+        bm25 score and a highlighted snippet, and the next offset if any.
+        """
+        match = self._fts_query(query)
+        session = self._get_session()
+        try:
+            rows = session.execute(text(
+                "SELECT p.id, bm25(posts_fts, 1.0, 0.5) AS score, "
+                "snippet(posts_fts, 0, '[', ']', '…', 16) AS snippet "
+                "FROM posts_fts JOIN posts_fts_ids i ON i.fts_rowid = posts_fts.rowid "
+                "JOIN cached_posts p ON p.id = i.post_id "
+                "WHERE posts_fts MATCH :match AND p.deleted_at IS NULL "
+                "ORDER BY score, p.fetched_at DESC LIMIT :limit OFFSET :offset"
+            ), {'match': match, 'limit': limit + 1, 'offset': offset}).fetchall()
+            
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            posts = {p.id: p for p in session.query(CachedPost).filter(
+                CachedPost.id.in_([r.id for r in rows])
+            )}
+            
+            results = []
+            for r in rows:
+                if r.id in posts:
+                    result = self._post_to_dict(posts[r.id])
+                    result['score'] = -r.score  # bm25 is lower-is-better
+                    result['snippet'] = r.snippet
+                    results.append(result)
+            return {'results': results, 'next_offset': offset + limit if has_more else None}
+        finally:
+            session.close()
+    
+    # Per-friend high-water marks
+    def get_watermarks(self, friend_urls: List[str]) -> Dict[str, str]:
+        """Newest cached post URL for each friend that has one
+        
+        Only marks whose post is still servable count: if that post was
+        tombstoned or aged out, an incremental scrape stopping at it would
+        never re-fetch what is missing.
+        """
+        session = self._get_session()
+        try:
+            marks = session.query(FriendWatermark.friend_url, FriendWatermark.newest_post_url).join(
+                CachedPost, CachedPost.id == FriendWatermark.newest_post_url
+            ).filter(
+                FriendWatermark.friend_url.in_(friend_urls),
+                self._usable(CachedPost, True, settings.CACHE_STALE_MAX_POSTS, settings.CACHE_EXPIRY_POSTS)
+            ).all()
+            return {friend_url: post_url for friend_url, post_url in marks}
+        finally:
+            session.close()
+    
+    def set_watermarks(self, marks: Dict[str, str]):
+        session = self._get_session()
+        try:
+            for friend_url, post_url in marks.items():
+                session.merge(FriendWatermark(
+                    friend_url=friend_url,
+                    newest_post_url=post_url,
+                    updated_at=datetime.utcnow()
+                ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def clear_watermarks(self):
+        session = self._get_session()
+        try:
+            session.query(FriendWatermark).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def touch_posts(self, author_urls: List[str], expiry_hours: int = 1):
+        """Extend expiry of already-cached posts by these authors"""
+        session = self._get_session()
+        try:
+            session.query(CachedPost).filter(
+                CachedPost.author_url.in_(author_urls)
+            ).update(
+                {CachedPost.expires_at: datetime.utcnow() + timedelta(hours=expiry_hours)},
+                synchronize_session=False
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
     def store_post(self, post_id: str, author_name: str, author_url: str, 
                    content: str, url: str, timestamp: str = '', 
                    image_url: str = None, source_type: str = 'friend',
                    expiry_hours: int = 1):
         """Store a single post in cache"""
+        try:
+            self.upsert_posts([{
+                'id': post_id,
+                'author': {'name': author_name, 'profile_url': author_url},
+                'content': content,
+                'url': url,
+                'timestamp': timestamp,
+                'image_url': image_url
+            }], source_type=source_type, expiry_hours=expiry_hours)
+        except Exception as e:
+            print(f"[CacheService] Error storing post: {e}")
+
+    def upsert_posts(self, posts: List[Dict], source_type: str = 'friend', expiry_hours: int = 1):
+        """Store scraped posts in one transaction
+        
+        New posts are inserted; existing ones are overwritten with the
+        scraped columns and get their expiry refreshed.
+        """
+        if not posts:
+            return
+        
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=expiry_hours)
+        rows = {}
+        for post in posts:
+            image_url = post.get('image_url')
+            row = {
+                'id': post['id'],
+                'author_name': post['author']['name'],
+                'author_url': post['author']['profile_url'],
+                'content': post['content'],
+                'url': post.get('url'),
+                'timestamp': post.get('timestamp') or '',
+                'post_type': 'text',
+                'is_sponsored': False,
+                'is_suggested': False,
+                'source_type': source_type,
+                'likes': 0,
+                'comments': 0,
+                'shares': 0,
+                'images': json.dumps([image_url] if image_url else []),
+                'videos': json.dumps([])
+            }
+            row.update(content_hash=self._content_hash(row), fetched_at=now,
+                       expires_at=expires_at, deleted_at=None)
+            rows[post['id']] = row
+        rows = list(rows.values())  # Last copy of a repeated id wins
+        
         session = self._get_session()
         try:
-            # Check if post already exists
-            existing = session.query(CachedPost).filter_by(id=post_id).first()
-            if existing:
-                # Update existing
-                existing.content = content
-                existing.fetched_at = datetime.utcnow()
-                existing.expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-            else:
-                # Create new
-                expires_at = datetime.utcnow() + timedelta(hours=expiry_hours)
-                cached_post = CachedPost(
-                    id=post_id,
-                    author_name=author_name,
-                    author_url=author_url,
-                    content=content,
-                    url=url,
-                    timestamp=timestamp or '',
-                    post_type='text',
-                    is_sponsored=False,
-                    is_suggested=False,
-                    source_type=source_type,
-                    likes=0,
-                    comments=0,
-                    shares=0,
-                    images=json.dumps([image_url] if image_url else []),
-                    videos=json.dumps([]),
-                    expires_at=expires_at,
-                    fetched_at=datetime.utcnow()
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                stmt = sqlite_insert(CachedPost).values(rows[i:i + UPSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[CachedPost.id],
+                    # Every hashed column, so content_hash always describes the stored row
+                    set_={name: stmt.excluded[name] for name in rows[0] if name != 'id'}
                 )
-                session.add(cached_post)
-            
+                session.execute(stmt)
             session.commit()
         except Exception as e:
             session.rollback()
-            print(f"[CacheService] Error storing post: {e}")
+            raise e
         finally:
             session.close()
-
+    
     # Helper methods
+    def _merge(self, session, model, rows: List[Dict], expiry_hours: int) -> Dict[str, int]:
+        """Diff a full scrape against the table instead of replacing it
+        
+        New and changed rows are upserted, rows whose content hash matches
+        only get fetched_at/expires_at bumped, and live rows missing from
+        `rows` are tombstoned, so writes scale with what changed.
+        """
+        key = model.__mapper__.primary_key[0]
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=expiry_hours)
+        
+        incoming = {}
+        for row in rows:
+            incoming[row[key.name]] = dict(row, content_hash=self._content_hash(row))  # Last copy of a repeated key wins
+        
+        existing = {k: (content_hash, deleted_at) for k, content_hash, deleted_at
+                    in session.query(key, model.content_hash, model.deleted_at)}
+        
+        unchanged, changed = [], []
+        for k, row in incoming.items():
+            old = existing.get(k)
+            if old and old[0] == row['content_hash'] and old[1] is None:
+                unchanged.append(k)
+            else:
+                changed.append(dict(row, fetched_at=now, expires_at=expires_at, deleted_at=None))
+        removed = [k for k, (_, deleted_at) in existing.items() if deleted_at is None and k not in incoming]
+        
+        for chunk in self._chunks(unchanged, KEY_CHUNK_SIZE):
+            session.query(model).filter(key.in_(chunk)).update(
+                {model.fetched_at: now, model.expires_at: expires_at}, synchronize_session=False
+            )
+        for chunk in self._chunks(changed, UPSERT_CHUNK_SIZE):
+            stmt = sqlite_insert(model).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={name: stmt.excluded[name] for name in chunk[0] if name != key.name}
+            )
+            session.execute(stmt)
+        for chunk in self._chunks(removed, KEY_CHUNK_SIZE):
+            session.query(model).filter(key.in_(chunk)).update(
+                {model.deleted_at: now}, synchronize_session=False
+            )
+            if model is CachedPost:
+                self._clear_watermarks_for(session, chunk)
+        
+        return {'changed': len(changed), 'unchanged': len(unchanged), 'removed': len(removed)}
+    
+    @staticmethod
+    def _clear_watermarks_for(session, post_ids: List[str]):
+        """Drop the watermarks of friends whose posts were tombstoned, so their next scrape is a full one"""
+        authors = [a for (a,) in session.query(CachedPost.author_url).filter(
+            CachedPost.id.in_(post_ids)
+        ).distinct() if a]
+        session.query(FriendWatermark).filter(or_(
+            FriendWatermark.friend_url.in_(authors),
+            FriendWatermark.newest_post_url.in_(post_ids)
+        )).delete(synchronize_session=False)
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turn free text into an FTS5 query of quoted terms (all required), keeping trailing * prefixes"""
+        terms = re.findall(r'\w+\*?', query)
+        if not terms:
+            raise ValueError("Search query has no words")
+        return ' '.join(
+            f'"{t[:-1]}"*' if t.endswith('*') else f'"{t}"' for t in terms
+        )
+    
+    @staticmethod
+    def _content_hash(row: Dict) -> str:
+        return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+    
+    @staticmethod
+    def _chunks(items: List, size: int):
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+    
+    def _usable(self, model, allow_stale: bool, hard_ttl_hours: int, soft_ttl_hours: int):
+        """Filter for rows that may be served: not tombstoned, and unexpired or within the hard TTL when stale is allowed
+        
+        The hard TTL runs from expiry, not from fetch, so rows whose expiry
+        was extended (touch_posts) stay servable. It allows
+        hard_ttl_hours - soft_ttl_hours past expiry. Rows without an expiry
+        fall back to their fetch time.
+        """
+        now = datetime.utcnow()
+        if allow_stale:
+            grace = timedelta(hours=max(hard_ttl_hours - soft_ttl_hours, 0))
+            return and_(model.deleted_at.is_(None), or_(
+                model.expires_at > now - grace,
+                and_(model.expires_at.is_(None), model.fetched_at > now - timedelta(hours=hard_ttl_hours))
+            ))
+        return and_(model.deleted_at.is_(None), model.expires_at > now)
+    
+    def _cache_read(self, data, rows) -> CacheRead:
+        """Wrap converted rows with the oldest fetch time and whether any row is past its TTL"""
+        now = datetime.utcnow()
+        expiries = [r.expires_at for r in rows if r.expires_at is not None]
+        # Rows written before content hashes existed fall back to their fetch time
+        version = hashlib.sha1('|'.join(
+            r.content_hash or r.fetched_at.isoformat() for r in rows
+        ).encode()).hexdigest()
+        return CacheRead(
+            data=data,
+            fetched_at=min(r.fetched_at for r in rows),
+            stale=len(expiries) < len(rows) or any(e <= now for e in expiries),
+            expires_at=min(expiries) if expiries else None,
+            last_modified=max(r.fetched_at for r in rows),
+            version=version
+        )
+    
     def _post_to_dict(self, post: CachedPost, base_url: str = None) -> Dict:
         import hashlib
         
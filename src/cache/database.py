@@ -1,11 +1,27 @@
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, DateTime, Text
+from sqlalchemy import create_engine, event, inspect, text, Index, Column, String, Integer, Boolean, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
 import json
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# PRAGMA profiles for CACHE_DB_PROFILE. All use WAL so readers never block the
+# refresh writer; they trade durability of the last commits for write speed.
+SQLITE_PROFILES = {
+    'durable': {'synchronous': 'FULL', 'cache_size': -8000, 'mmap_size': 0},
+    'balanced': {'synchronous': 'NORMAL', 'cache_size': -32000, 'mmap_size': 64 * 1024 * 1024},
+    'fast': {'synchronous': 'OFF', 'cache_size': -64000, 'mmap_size': 256 * 1024 * 1024},
+}
+
+# Shared session factory; bound to the engine by init_database
+SessionLocal = sessionmaker()
+
 class CachedPost(Base):
     __tablename__ = 'cached_posts'
     
@@ -25,7 +41,22 @@ class CachedPost(Base):
     images = Column(Text)  # JSON array
     videos = Column(Text)  # JSON array
     fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+    first_seen_at = Column(DateTime, default=datetime.utcnow)  # Set on insert only: the feed's page order
     expires_at = Column(DateTime, index=True)
+    content_hash = Column(String)  # Detects unchanged rows on refresh
+    deleted_at = Column(DateTime)  # Tombstone: gone from the latest scrape
+    
+    __table_args__ = (
+        # Keyset pagination: newest-first pages of live posts, optionally per source or author.
+        # Keyed on first_seen_at, which refreshes never move, so pages stay put while they run.
+        # Partial, so reads filtering on deleted_at IS NULL walk them in order with no sort.
+        Index('ix_cached_posts_live_first_seen_id', 'first_seen_at', 'id',
+              sqlite_where=text('deleted_at IS NULL')),
+        Index('ix_cached_posts_live_source_first_seen_id', 'source_type', 'first_seen_at', 'id',
+              sqlite_where=text('deleted_at IS NULL')),
+        Index('ix_cached_posts_live_author_first_seen_id', 'author_url', 'first_seen_at', 'id',
+              sqlite_where=text('deleted_at IS NULL')),
+    )
 
 class CachedFriend(Base):
     __tablename__ = 'cached_friends'
@@ -37,6 +68,8 @@ class CachedFriend(Base):
     profile_picture = Column(String)
     fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
     expires_at = Column(DateTime, index=True)
+    content_hash = Column(String)  # Detects unchanged rows on refresh
+    deleted_at = Column(DateTime, index=True)  # Tombstone: gone from the latest scrape
 
 class CachedFollowing(Base):
     __tablename__ = 'cached_following'
@@ -57,6 +90,8 @@ class CachedProfile(Base):
     url = Column(String)
     fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
     expires_at = Column(DateTime, index=True)
+    content_hash = Column(String)  # Detects unchanged rows on refresh
+    deleted_at = Column(DateTime, index=True)  # Tombstone: gone from the latest scrape
 
 class CachedFriendRequest(Base):
     __tablename__ = 'cached_friend_requests'
@@ -68,6 +103,32 @@ class CachedFriendRequest(Base):
     profile_picture = Column(String)
     fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
     expires_at = Column(DateTime, index=True)
+    content_hash = Column(String)  # Detects unchanged rows on refresh
+    deleted_at = Column(DateTime, index=True)  # Tombstone: gone from the latest scrape
+
+class FriendWatermark(Base):
+    __tablename__ = 'friend_watermarks'
+    
+    friend_url = Column(String, primary_key=True)
+    newest_post_url = Column(String)  # Newest post already cached for this friend
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class MediaObject(Base):
+    __tablename__ = 'media_objects'
+    
+    content_hash = Column(String, primary_key=True)  # sha256 of the image bytes; names the file
+    content_type = Column(String)
+    size = Column(Integer, default=0)  # Bytes on disk, including generated variants
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)  # LRU eviction order
+
+class MediaUrl(Base):
+    __tablename__ = 'media_urls'
+    
+    url_key = Column(String, primary_key=True)  # md5 of the URL: the public /media/image key
+    url = Column(Text)
+    content_hash = Column(String, index=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
 
 class CacheMetadata(Base):
     __tablename__ = 'cache_metadata'
@@ -78,13 +139,153 @@ class CacheMetadata(Base):
     fetch_count = Column(Integer, default=0)
     error_count = Column(Integer, default=0)
 
-def init_database(db_path: str = "cache.db"):
+def init_database(db_path: str = "cache.db", profile: str = None):
     """Initialize database and create tables"""
-    engine = create_engine(f'sqlite:///{db_path}')
+    profile = profile or settings.CACHE_DB_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown cache DB profile: {profile}")
+    
+    engine = create_engine(
+        f'sqlite:///{db_path}',
+        connect_args={
+            'check_same_thread': False,  # pooled connections move between threads
+            'timeout': settings.CACHE_DB_BUSY_TIMEOUT / 1000,
+        },
+        poolclass=QueuePool,
+        pool_size=settings.CACHE_DB_POOL_SIZE,
+        max_overflow=settings.CACHE_DB_POOL_SIZE,
+    )
+    _configure_sqlite(engine, SQLITE_PROFILES[profile])
+    
     Base.metadata.create_all(engine)
+    _migrate(engine)
+    _setup_fts(engine)
+    SessionLocal.configure(bind=engine)
     return engine
 
-def get_session(engine):
+# Indexes replaced by newer ones; dropped from existing databases
+OBSOLETE_INDEXES = [
+    'ix_cached_posts_deleted_at',  # beat the keyset indexes and forced a sort of every live post
+    'ix_cached_posts_fetched_id',
+    'ix_cached_posts_source_fetched_id',
+    'ix_cached_posts_author_fetched_id',
+    # Keyed on fetched_at, which every refresh bumps, so pages shifted under a paging client
+    'ix_cached_posts_live_fetched_id',
+    'ix_cached_posts_live_source_fetched_id',
+    'ix_cached_posts_live_author_fetched_id',
+]
+
+# Columns filled from an existing one when added to an existing table
+COLUMN_BACKFILLS = {
+    ('cached_posts', 'first_seen_at'): 'fetched_at',
+}
+
+def _migrate(engine):
+    """Add columns and indexes introduced since the tables were created
+    
+    create_all only creates missing tables, it never alters existing ones.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in Base.metadata.sorted_tables:
+            present = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    ))
+                    source = COLUMN_BACKFILLS.get((table.name, column.name))
+                    if source:
+                        conn.execute(text(f"UPDATE {table.name} SET {column.name} = {source}"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+# Full-text index over cached_posts (external content: the text lives only in
+# cached_posts, triggers keep the index in sync). cached_posts has a text key
+# and its implicit rowid can be renumbered by VACUUM, so the index is keyed on
+# posts_fts_ids.fts_rowid, a stable integer per post id, and reads its content
+# through the posts_fts_content view.
+FTS_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS posts_fts_ids (
+        fts_rowid INTEGER PRIMARY KEY,
+        post_id TEXT NOT NULL UNIQUE
+    )""",
+    """CREATE VIEW IF NOT EXISTS posts_fts_content AS
+        SELECT i.fts_rowid, p.content, p.author_name
+        FROM posts_fts_ids i JOIN cached_posts p ON p.id = i.post_id""",
+]
+
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS cached_posts_fts_insert AFTER INSERT ON cached_posts BEGIN
+        INSERT OR IGNORE INTO posts_fts_ids(post_id) VALUES (new.id);
+        INSERT INTO posts_fts(rowid, content, author_name) VALUES (
+            (SELECT fts_rowid FROM posts_fts_ids WHERE post_id = new.id), new.content, new.author_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cached_posts_fts_delete AFTER DELETE ON cached_posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, content, author_name) VALUES (
+            'delete', (SELECT fts_rowid FROM posts_fts_ids WHERE post_id = old.id), old.content, old.author_name);
+        DELETE FROM posts_fts_ids WHERE post_id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cached_posts_fts_update AFTER UPDATE OF content, author_name ON cached_posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, content, author_name) VALUES (
+            'delete', (SELECT fts_rowid FROM posts_fts_ids WHERE post_id = old.id), old.content, old.author_name);
+        INSERT INTO posts_fts(rowid, content, author_name) VALUES (
+            (SELECT fts_rowid FROM posts_fts_ids WHERE post_id = new.id), new.content, new.author_name);
+    END""",
+]
+
+def _setup_fts(engine):
+    """Create the FTS5 index and its sync triggers, indexing existing posts the first time
+    
+    An index from before posts_fts_ids (keyed on cached_posts' rowid) is
+    dropped and rebuilt.
+    """
+    try:
+        with engine.begin() as conn:
+            existing = conn.execute(text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+            )).scalar()
+            if existing and 'posts_fts_content' not in existing:
+                for trigger in ('cached_posts_fts_insert', 'cached_posts_fts_delete', 'cached_posts_fts_update'):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                conn.execute(text("DROP TABLE posts_fts"))
+                existing = None
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            if not existing:
+                conn.execute(text("INSERT OR IGNORE INTO posts_fts_ids(post_id) SELECT id FROM cached_posts"))
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE posts_fts USING fts5("
+                    "content, author_name, content='posts_fts_content', content_rowid='fts_rowid', "
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                ))
+                conn.execute(text("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')"))
+            for trigger in FTS_TRIGGERS:
+                conn.execute(text(trigger))
+    except Exception as e:
+        # SQLite builds without FTS5: everything but /posts/search still works
+        logger.warning(f"Full-text search unavailable: {e}")
+
+def _configure_sqlite(engine, pragmas: dict):
+    """Apply journal/sync/cache PRAGMAs to every new pooled connection"""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.CACHE_DB_BUSY_TIMEOUT)}")
+            cursor.execute(f"PRAGMA synchronous={pragmas['synchronous']}")
+            cursor.execute(f"PRAGMA cache_size={int(pragmas['cache_size'])}")
+            cursor.execute(f"PRAGMA mmap_size={int(pragmas['mmap_size'])}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+def get_session(engine=None):
     """Get database session"""
-    Session = sessionmaker(bind=engine)
-    return Session()
+    if engine is None:
+        return SessionLocal()
+    return SessionLocal(bind=engine)
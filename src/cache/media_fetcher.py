@@ -0,0 +1,225 @@
+"""Pooled, concurrent image downloads into the media store"""
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import httpx
+from src.cache.media_store import MediaStore, sniff_content_type
+from src.core.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables httpx's HTTP/2 support)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Window for the recent images/s figure
+THROUGHPUT_WINDOW = 60.0
+
+
+class MediaFetcher:
+    """Downloads images into the MediaStore over one shared client
+
+    All downloads share a pooled (HTTP/2 when available) httpx client, so
+    connections to the fbcdn hosts are reused. At most `concurrency`
+    downloads run at once, and at most `per_host` against any one host.
+    Bodies are streamed to a temp file while being hashed, then handed to
+    the store, so readers never see a partial image. `prefetch` queues URLs for background
+    workers and drops them when the bounded queue is full.
+    """
+
+    def __init__(self, store: MediaStore, concurrency: int = 8, per_host: int = 4,
+                 queue_size: int = 256, timeout: float = 10.0, http2: bool = True,
+                 flush_interval: float = 30.0):
+        self.store = store
+        self.concurrency = max(concurrency, 1)
+        self.per_host = max(per_host, 1)
+        self.timeout = timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.flush_interval = flush_interval
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._flight = SingleFlight()
+
+        self.downloaded = 0
+        self.bytes_downloaded = 0
+        self.bytes_captured = 0
+        self.already_cached = 0
+        self.captured = 0
+        self.failed = 0
+        self.dropped = 0
+        self._busy_seconds = 0.0
+        self._recent = deque()  # completion times within THROUGHPUT_WINDOW
+
+    async def start(self):
+        """Open the store and the shared client, and start the prefetch workers and access-time flusher"""
+        await asyncio.to_thread(self.store.open)
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency,
+                                    max_keepalive_connections=self.concurrency),
+            )
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_access_periodically())
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+        await asyncio.to_thread(self.store.flush_access)
+
+    async def _flush_access_periodically(self):
+        """Write image access times every flush_interval, so a crash loses little LRU recency"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.store.flush_access)
+            except Exception as e:
+                logger.error(f"Media access flush failed: {e}")
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        return hashlib.md5(url.encode()).hexdigest()
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """Download url into the store unless already there. Returns cache key, or None on failure."""
+        cache_key = self.cache_key(url)
+        if await asyncio.to_thread(self.store.lookup, cache_key):
+            self.already_cached += 1
+            return cache_key
+        # Concurrent requests for the same image share one download
+        ok = await self._flight.do(cache_key, lambda: self._download(url, cache_key))
+        return cache_key if ok else None
+
+    async def put(self, url: str, body: bytes, content_type: Optional[str] = None) -> Optional[str]:
+        """Store an image the browser already downloaded for url. Returns cache key."""
+        cache_key = self.cache_key(url)
+        if await asyncio.to_thread(self.store.lookup, cache_key):
+            self.already_cached += 1
+            return cache_key
+        try:
+            await asyncio.to_thread(self._put, cache_key, url, body, content_type)
+        except Exception as e:
+            logger.warning(f"Could not store captured image {url}: {e}")
+            return None
+        self.captured += 1
+        self.bytes_captured += len(body)
+        return cache_key
+
+    def _put(self, cache_key: str, url: str, body: bytes, content_type: Optional[str]):
+        tmp = self.store.temp_path(f"{cache_key}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp.write_bytes(body)
+            self.store.add(cache_key, url, tmp, hashlib.sha256(body).hexdigest(),
+                           sniff_content_type(body[:32], content_type))
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    async def fetch_many(self, urls: Iterable[str]) -> List[Optional[str]]:
+        """Fetch several images concurrently (within the fetcher's limits)"""
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+    def prefetch(self, url: str) -> bool:
+        """Queue url for a background download; False if the queue is full"""
+        try:
+            self._queue.put_nowait(url)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _worker(self):
+        while True:
+            url = await self._queue.get()
+            try:
+                await self.fetch(url)
+            except Exception as e:
+                logger.warning(f"Prefetch of {url} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _download(self, url: str, cache_key: str) -> bool:
+        if self._client is None:
+            await self.start()
+        host = urlparse(url).hostname or ''
+        host_slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        tmp = self.store.temp_path(f"{cache_key}.{uuid.uuid4().hex}.tmp")
+
+        # Wait for the host first, so a burst to one CDN host can't hold every global slot
+        async with host_slots, self._slots:
+            started = time.perf_counter()
+            try:
+                size = 0
+                digest = hashlib.sha256()
+                head = b''
+                async with self._client.stream('GET', url) as response:
+                    if response.status_code != 200:
+                        self.failed += 1
+                        return False
+                    # File I/O runs on worker threads, never on the event loop
+                    f = await asyncio.to_thread(open, tmp, 'wb')
+                    try:
+                        async for chunk in response.aiter_bytes(64 * 1024):
+                            await asyncio.to_thread(f.write, chunk)
+                            digest.update(chunk)
+                            if len(head) < 32:
+                                head += chunk[:32]
+                            size += len(chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+                    content_type = sniff_content_type(head, response.headers.get('content-type'))
+                await asyncio.to_thread(self.store.add, cache_key, url, tmp, digest.hexdigest(), content_type)
+            except Exception as e:
+                self.failed += 1
+                logger.debug(f"Image download failed for {url}: {e}")
+                await asyncio.to_thread(tmp.unlink, missing_ok=True)
+                return False
+            self._busy_seconds += time.perf_counter() - started
+
+        self.downloaded += 1
+        self.bytes_downloaded += size
+        self._recent.append(time.monotonic())
+        return True
+
+    def stats(self) -> Dict:
+        """Download counters and throughput"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > THROUGHPUT_WINDOW:
+            self._recent.popleft()
+        return {
+            'downloaded': self.downloaded,
+            'bytes_downloaded': self.bytes_downloaded,
+            'already_cached': self.already_cached,
+            'captured': self.captured,  # stored from the browser instead of downloaded
+            'bytes_captured': self.bytes_captured,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+            'http2': self.http2,
+            # Completed downloads per second over the last minute
+            'images_per_second': round(len(self._recent) / THROUGHPUT_WINDOW, 2),
+            # Average per-download latency, excluding time spent queued
+            'avg_download_seconds': round(self._busy_seconds / self.downloaded, 3) if self.downloaded else None,
+        }
@@ -0,0 +1,300 @@
+"""Content-addressed, quota-bounded image store"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.cache.database import MediaObject, MediaUrl, get_session
+
+logger = logging.getLogger(__name__)
+
+# Content type -> file extension
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+    'image/avif': 'avif',
+    'image/heic': 'heic',
+}
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+# Objects deleted per eviction query
+EVICT_BATCH = 100
+
+# Files of the old flat layout: `<md5(url)>.jpg` originals, their
+# `<md5>_<w>x<h>.<ext>` variants and `.<name>.<uuid>.tmp` partial writes
+FLAT_ORIGINAL_RE = re.compile(r"^([0-9a-f]{32})\.jpg$")
+FLAT_DERIVED_RE = re.compile(
+    r"^(?:[0-9a-f]{32}_\d+x\d+\.(?:jpg|webp|png)"
+    r"|\.[0-9a-f]{32}(?:_\d+x\d+)?\.(?:jpg|webp|png)\.[0-9a-f]{32}\.tmp)$"
+)
+
+
+def sniff_content_type(head: bytes, declared: Optional[str] = None) -> str:
+    """Image type from the leading bytes, falling back to the declared Content-Type"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in (b'avif', b'avis'):
+            return 'image/avif'
+        if brand in (b'heic', b'heix', b'mif1'):
+            return 'image/heic'
+    declared = (declared or '').split(';')[0].strip().lower()
+    return declared if declared in EXTENSIONS else DEFAULT_CONTENT_TYPE
+
+
+class MediaStore:
+    """Images stored once per content hash, with an index from URL to content
+
+    Files live at `root/ab/cd/<sha256>.<ext>`, so the same photo reached
+    through two signed CDN URLs is kept once. `media_urls` maps each URL's
+    cache key to its content, and `media_objects` records type, size and
+    last access. When the store outgrows `max_bytes`, the least recently
+    accessed objects (and their variants) are evicted down to
+    `low_water` of the quota.
+
+    Methods touch SQLite and the filesystem; call them off the event loop.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, low_water: float = 0.9, flush_after: int = 256):
+        self.root = Path(root)
+        self.tmp_dir = self.root / 'tmp'
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.total_bytes = 0
+        self.evicted = 0
+        self.flush_after = flush_after
+        self._lock = threading.Lock()
+        # Last-access times not yet written; flushed once flush_after are
+        # pending, by the caller's timer (see MediaFetcher) and before eviction
+        self._accessed: Dict[str, datetime] = {}
+        self._access_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._opened = False
+
+    def open(self):
+        """Create the directories, load the total size and adopt files from the flat layout"""
+        if self._opened:
+            return
+        self._opened = True
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.tmp_dir.iterdir():
+            stale.unlink(missing_ok=True)  # left by a crash mid-download
+        session = get_session()
+        try:
+            self.total_bytes = session.query(func.coalesce(func.sum(MediaObject.size), 0)).scalar()
+        finally:
+            session.close()
+        self._adopt_flat_files()
+        self.enforce_quota()
+
+    def object_path(self, content_hash: str, content_type: str) -> Path:
+        ext = EXTENSIONS.get(content_type, 'bin')
+        return self.root / content_hash[:2] / content_hash[2:4] / f"{content_hash}.{ext}"
+
+    def temp_path(self, name: str) -> Path:
+        return self.tmp_dir / name
+
+    def lookup(self, url_key: str, touch: bool = False) -> Optional[Tuple[Path, str, str]]:
+        """(path, content_type, content_hash) for a URL's cache key, or None if not stored
+
+        With touch, a hit also counts as an access for eviction.
+        """
+        session = get_session()
+        try:
+            row = session.query(MediaObject.content_hash, MediaObject.content_type).join(
+                MediaUrl, MediaUrl.content_hash == MediaObject.content_hash
+            ).filter(MediaUrl.url_key == url_key).first()
+        finally:
+            session.close()
+        if not row:
+            return None
+        path = self.object_path(row.content_hash, row.content_type)
+        if not path.is_file():
+            return None
+        if touch:
+            self.touch(row.content_hash)
+        return path, row.content_type, row.content_hash
+
+    def touch(self, content_hash: str):
+        """Record an access; written to SQLite once flush_after are pending"""
+        with self._access_lock:
+            self._accessed[content_hash] = datetime.utcnow()
+            due = len(self._accessed) >= self.flush_after
+        if due:
+            self.flush_access()
+
+    def add(self, url_key: str, url: Optional[str], tmp: Path, content_hash: str, content_type: str) -> Path:
+        """Move a downloaded file into the store and index it under url_key"""
+        path = self.object_path(content_hash, content_type)
+        now = datetime.utcnow()
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                tmp.unlink(missing_ok=True)  # same bytes already stored under another URL
+            else:
+                os.replace(tmp, path)
+            size = path.stat().st_size
+
+            session = get_session()
+            try:
+                inserted = session.execute(sqlite_insert(MediaObject).values(
+                    content_hash=content_hash, content_type=content_type, size=size,
+                    created_at=now, last_accessed=now
+                ).on_conflict_do_nothing()).rowcount
+                stmt = sqlite_insert(MediaUrl).values(
+                    url_key=url_key, url=url, content_hash=content_hash, fetched_at=now
+                )
+                session.execute(stmt.on_conflict_do_update(
+                    index_elements=['url_key'],
+                    set_={'url': stmt.excluded.url, 'content_hash': stmt.excluded.content_hash,
+                          'fetched_at': stmt.excluded.fetched_at}
+                ))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+            if inserted:
+                self.total_bytes += size
+        self.touch(content_hash)
+
+        if self.total_bytes > self.max_bytes:
+            self.enforce_quota()
+        return path
+
+    def add_variant_bytes(self, original: Path, size: int):
+        """Count a generated variant of `original` against the quota"""
+        content_hash = original.stem
+        with self._lock:
+            session = get_session()
+            try:
+                session.query(MediaObject).filter(MediaObject.content_hash == content_hash).update(
+                    {MediaObject.size: MediaObject.size + size}, synchronize_session=False
+                )
+                session.commit()
+            finally:
+                session.close()
+            self.total_bytes += size
+
+    def flush_access(self):
+        """Write pending last-access times"""
+        with self._flush_lock:
+            with self._access_lock:
+                pending, self._accessed = self._accessed, {}
+            if not pending:
+                return
+            session = get_session()
+            try:
+                session.bulk_update_mappings(MediaObject, [
+                    {'content_hash': h, 'last_accessed': t} for h, t in pending.items()
+                ])
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"Could not record media access times: {e}")
+                with self._access_lock:
+                    for h, t in pending.items():
+                        self._accessed.setdefault(h, t)  # keep them for the next flush
+            finally:
+                session.close()
+
+    def enforce_quota(self) -> int:
+        """Evict least recently accessed objects until under the low-water mark"""
+        with self._lock:
+            if self.total_bytes <= self.max_bytes:
+                return 0
+            self.flush_access()
+            target = int(self.max_bytes * self.low_water)
+            evicted = 0
+            session = get_session()
+            try:
+                while self.total_bytes > target:
+                    victims = session.query(MediaObject).order_by(
+                        MediaObject.last_accessed
+                    ).limit(EVICT_BATCH).all()
+                    if not victims:
+                        break
+                    removed: List[str] = []
+                    for obj in victims:
+                        if self.total_bytes <= target:
+                            break
+                        self._delete_files(obj.content_hash, obj.content_type)
+                        self.total_bytes -= obj.size or 0
+                        removed.append(obj.content_hash)
+                    session.query(MediaUrl).filter(MediaUrl.content_hash.in_(removed)).delete(synchronize_session=False)
+                    session.query(MediaObject).filter(MediaObject.content_hash.in_(removed)).delete(synchronize_session=False)
+                    session.commit()
+                    evicted += len(removed)
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+            self.total_bytes = max(self.total_bytes, 0)
+            self.evicted += evicted
+        if evicted:
+            logger.info(f"Media cache over quota: evicted {evicted} images")
+        return evicted
+
+    def _delete_files(self, content_hash: str, content_type: str):
+        path = self.object_path(content_hash, content_type)
+        for variant in path.parent.glob(f"{content_hash}_*"):
+            variant.unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+    def _adopt_flat_files(self):
+        """Move `<md5(url)>.jpg` files from the old flat layout into the store
+
+        Only names the old layout produced are touched; anything else in
+        the directory is left alone.
+        """
+        adopted = 0
+        for path in list(self.root.iterdir()):
+            if not path.is_file():
+                continue
+            if FLAT_DERIVED_RE.match(path.name):
+                path.unlink(missing_ok=True)  # old-layout variant or partial download
+                continue
+            match = FLAT_ORIGINAL_RE.match(path.name)
+            if not match:
+                continue
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                head = f.read(32)
+                digest.update(head)
+                for chunk in iter(lambda: f.read(64 * 1024), b''):
+                    digest.update(chunk)
+            self.add(match.group(1), None, path, digest.hexdigest(), sniff_content_type(head, 'image/jpeg'))
+            adopted += 1
+        if adopted:
+            logger.info(f"Moved {adopted} cached images into the content-addressed store")
+
+    def stats(self) -> Dict:
+        session = get_session()
+        try:
+            objects = session.query(func.count(MediaObject.content_hash)).scalar()
+            urls = session.query(func.count(MediaUrl.url_key)).scalar()
+        finally:
+            session.close()
+        return {
+            'objects': objects,
+            'urls': urls,
+            'bytes': self.total_bytes,
+            'quota_bytes': self.max_bytes,
+            'evicted': self.evicted,
+        }
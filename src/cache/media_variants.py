@@ -0,0 +1,104 @@
+"""Resized / re-encoded variants of cached images"""
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+from src.core.single_flight import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # Variants disabled; originals are served instead
+    Image = None
+
+# format= value -> (Pillow format, file extension, media type)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'png': ('PNG', 'png', 'image/png'),
+}
+FORMAT_ALIASES = {'jpg': 'jpeg'}
+# Stored content type -> format a resize keeps when none is asked for.
+# GIFs become PNG to keep transparency; types we can't write fall back to JPEG.
+SOURCE_FORMATS = {
+    'image/jpeg': 'jpeg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'png',
+}
+
+
+def normalize_format(fmt: Optional[str]) -> Optional[str]:
+    """Canonical format name; raises ValueError for formats we don't produce"""
+    if fmt is None:
+        return None
+    fmt = FORMAT_ALIASES.get(fmt.lower(), fmt.lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}' (use {', '.join(FORMATS)})")
+    return fmt
+
+
+def source_format(content_type: str) -> str:
+    """Format to write a resized copy of an image of this type in"""
+    return SOURCE_FORMATS.get(content_type, 'jpeg')
+
+
+class VariantStore:
+    """Generates each (size, format) derivative once and keeps it beside the original
+
+    `w`/`h` bound the output box; the aspect ratio is kept and images are
+    never upscaled. Concurrent requests for the same variant share one
+    encode, which runs off the event loop. `on_render(original, size)` is
+    called (on the worker thread) for each new variant file.
+    """
+
+    def __init__(self, quality: int = 80, max_dimension: int = 2048,
+                 on_render: Optional[Callable[[Path, int], None]] = None):
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.on_render = on_render
+        self._flight = SingleFlight()
+        self.generated = 0
+        self.served = 0
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    @staticmethod
+    def variant_path(original: Path, w: Optional[int], h: Optional[int], fmt: str) -> Path:
+        return original.with_name(f"{original.stem}_{w or 0}x{h or 0}.{FORMATS[fmt][1]}")
+
+    async def get(self, original: Path, w: Optional[int], h: Optional[int], fmt: str) -> Path:
+        """Path of the variant, generating it on first request"""
+        path = self.variant_path(original, w, h, fmt)
+        if not path.exists():
+            await self._flight.do(str(path), lambda: asyncio.to_thread(self._render, original, path, w, h, fmt))
+        self.served += 1
+        return path
+
+    def _render(self, original: Path, path: Path, w: Optional[int], h: Optional[int], fmt: str):
+        if path.exists():
+            return
+        pil_format = FORMATS[fmt][0]
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with Image.open(original) as img:
+                if w or h:
+                    img.thumbnail((min(w or img.width, self.max_dimension),
+                                   min(h or img.height, self.max_dimension)))
+                if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                    img = img.convert('RGB')
+                options = {'optimize': True}
+                if pil_format in ('JPEG', 'WEBP'):
+                    options['quality'] = self.quality
+                img.save(tmp, pil_format, **options)
+            os.replace(tmp, path)
+            self.generated += 1
+            if self.on_render:
+                self.on_render(original, path.stat().st_size)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def stats(self):
+        return {'enabled': self.enabled, 'generated': self.generated, 'served': self.served}
@@ -1,14 +1,15 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from config.settings import settings
-from src.cache.cache_service import CacheService
+from src.cache.async_cache import AsyncCacheService
 
 logger = logging.getLogger(__name__)
 
 class RefreshTasks:
-    def __init__(self, cache_service: CacheService, session_manager, services: dict):
+    def __init__(self, cache_service: AsyncCacheService, session_manager, services: dict):
         self.cache = cache_service
         self.session_manager = session_manager
         self.services = services
@@ -35,7 +36,7 @@ class RefreshTasks:
         """Refresh posts cache by aggregating from news feed"""
         async with self.scrape_lock:
             try:
-                meta = self.cache.get_metadata('posts')
+                meta = await self.cache.get_metadata('posts')
                 if meta and meta['error_count'] >= settings.CACHE_MAX_ERROR_COUNT:
                     logger.warning(f"Skipping posts refresh due to {meta['error_count']} consecutive errors")
                     return
@@ -53,25 +54,32 @@ class RefreshTasks:
                 
                 # Use FeedAggregator to scrape news feed
                 from src.scraper.feed_aggregator import FeedAggregator
-                aggregator = FeedAggregator(self.session_manager.page)
-                posts = await aggregator.get_feed(friends, following, limit=10, include_own_profile=False)
-                
-                # Pre-fetch and cache images
-                from src.api.routes.media import fetch_and_cache_image
-                for post in posts:
-                    if post.get('media', {}).get('images'):
-                        for img_url in post['media']['images']:
-                            try:
-                                await fetch_and_cache_image(img_url)
-                            except:
-                                pass
+                from src.api.routes.media import media_fetcher, new_capture, post_image_urls, store_captured
+                capture = new_capture()
+                async with self.session_manager.lease() as page:
+                    aggregator = FeedAggregator(page, capture=capture)
+                    posts = await aggregator.get_feed(friends, following, limit=10, include_own_profile=False)
+                
+                # Pre-fetch and cache images (concurrently, over the shared client)
+                image_urls = post_image_urls(posts)
+                if capture:
+                    # Images the browser already downloaded skip the second trip
+                    stored = await store_captured(capture, posts)
+                    logger.info(f"Stored {stored}/{len(image_urls)} images from the browser: {capture.stats()}")
+                if image_urls:
+                    started = time.perf_counter()
+                    keys = await media_fetcher.fetch_many(image_urls)
+                    elapsed = time.perf_counter() - started
+                    fetched = sum(1 for k in keys if k)
+                    logger.info(f"Cached {fetched}/{len(image_urls)} images in {elapsed:.1f}s "
+                                f"({fetched / elapsed if elapsed else 0:.1f} images/s)")
                 
                 if posts:
-                    self.cache.set_posts(posts, settings.CACHE_EXPIRY_POSTS)
+                    await self.cache.upsert_posts(posts, source_type='friend', expiry_hours=settings.CACHE_EXPIRY_POSTS)
                     self.last_scrape_time = datetime.utcnow()
                     
                     next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_POSTS)
-                    self.cache.update_metadata('posts', True, next_fetch)
+                    await self.cache.update_metadata('posts', True, next_fetch)
                     logger.info(f"Cached {len(posts)} posts from news feed")
                 else:
                     raise Exception("No posts returned from news feed")
@@ -79,13 +87,13 @@ class RefreshTasks:
             except Exception as e:
                 logger.error(f"Error refreshing posts: {e}")
                 next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_POSTS * 2)
-                self.cache.update_metadata('posts', False, next_fetch)
+                await self.cache.update_metadata('posts', False, next_fetch)
     
     async def refresh_friends(self):
         """Refresh friends cache"""
         async with self.scrape_lock:
             try:
-                meta = self.cache.get_metadata('friends')
+                meta = await self.cache.get_metadata('friends')
                 if meta and meta['error_count'] >= settings.CACHE_MAX_ERROR_COUNT:
                     logger.warning(f"Skipping friends refresh due to {meta['error_count']} consecutive errors")
                     return
@@ -101,11 +109,11 @@ class RefreshTasks:
                 result = await friends_service.get_friends_list(limit=50)
                 if result['success']:
                     friends = result['data']
-                    self.cache.set_friends(friends, settings.CACHE_EXPIRY_FRIENDS)
+                    await self.cache.set_friends(friends, settings.CACHE_EXPIRY_FRIENDS)
                     self.last_scrape_time = datetime.utcnow()
                     
                     next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_FRIENDS)
-                    self.cache.update_metadata('friends', True, next_fetch)
+                    await self.cache.update_metadata('friends', True, next_fetch)
                     logger.info(f"Cached {len(friends)} friends")
                 else:
                     raise Exception(result.get('error', 'Unknown error'))
@@ -113,13 +121,13 @@ class RefreshTasks:
             except Exception as e:
                 logger.error(f"Error refreshing friends: {e}")
                 next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_FRIENDS * 2)
-                self.cache.update_metadata('friends', False, next_fetch)
+                await self.cache.update_metadata('friends', False, next_fetch)
     
     async def refresh_profile(self):
         """Refresh profile cache"""
         async with self.scrape_lock:
             try:
-                meta = self.cache.get_metadata('profile')
+                meta = await self.cache.get_metadata('profile')
                 if meta and meta['error_count'] >= settings.CACHE_MAX_ERROR_COUNT:
                     logger.warning(f"Skipping profile refresh due to {meta['error_count']} consecutive errors")
                     return
@@ -135,11 +143,11 @@ class RefreshTasks:
                 result = await profile_service.get_profile()
                 if result['success']:
                     profile = result['data']
-                    self.cache.set_profile(profile, settings.CACHE_EXPIRY_PROFILE)
+                    await self.cache.set_profile(profile, settings.CACHE_EXPIRY_PROFILE)
                     self.last_scrape_time = datetime.utcnow()
                     
                     next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_PROFILE)
-                    self.cache.update_metadata('profile', True, next_fetch)
+                    await self.cache.update_metadata('profile', True, next_fetch)
                     logger.info("Cached profile")
                 else:
                     raise Exception(result.get('error', 'Unknown error'))
@@ -147,13 +155,13 @@ class RefreshTasks:
             except Exception as e:
                 logger.error(f"Error refreshing profile: {e}")
                 next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_PROFILE * 2)
-                self.cache.update_metadata('profile', False, next_fetch)
+                await self.cache.update_metadata('profile', False, next_fetch)
     
     async def refresh_friend_requests(self):
         """Refresh friend requests cache"""
         async with self.scrape_lock:
             try:
-                meta = self.cache.get_metadata('requests')
+                meta = await self.cache.get_metadata('requests')
                 if meta and meta['error_count'] >= settings.CACHE_MAX_ERROR_COUNT:
                     logger.warning(f"Skipping requests refresh due to {meta['error_count']} consecutive errors")
                     return
@@ -169,11 +177,11 @@ class RefreshTasks:
                 result = await friends_service.get_friend_requests()
                 if result['success']:
                     requests = result['data']
-                    self.cache.set_friend_requests(requests, settings.CACHE_EXPIRY_REQUESTS)
+                    await self.cache.set_friend_requests(requests, settings.CACHE_EXPIRY_REQUESTS)
                     self.last_scrape_time = datetime.utcnow()
                     
                     next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_REQUESTS)
-                    self.cache.update_metadata('requests', True, next_fetch)
+                    await self.cache.update_metadata('requests', True, next_fetch)
                     logger.info(f"Cached {len(requests)} friend requests")
                 else:
                     raise Exception(result.get('error', 'Unknown error'))
@@ -181,4 +189,4 @@ class RefreshTasks:
             except Exception as e:
                 logger.error(f"Error refreshing friend requests: {e}")
                 next_fetch = datetime.utcnow() + timedelta(minutes=settings.CACHE_REFRESH_REQUESTS * 2)
-                self.cache.update_metadata('requests', False, next_fetch)
+                await self.cache.update_metadata('requests', False, next_fetch)
@@ -0,0 +1,42 @@
+"""Background refreshes triggered by stale cache reads"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Set
+from src.core.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class Revalidator:
+    """Fire-and-forget cache refreshes, at most one in flight per key"""
+    
+    def __init__(self):
+        self.flight = SingleFlight()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def trigger(self, key: str, refresh: Callable[[], Awaitable]):
+        """Start refresh() in the background unless one for key is already running"""
+        if self.flight.in_flight(key):
+            return
+        task = asyncio.create_task(self._run(key, refresh))
+        # Hold a reference so the task isn't garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, key: str, refresh: Callable[[], Awaitable]):
+        try:
+            logger.info(f"Revalidating stale cache: {key}")
+            await self.flight.do(key, refresh)
+        except Exception as e:
+            logger.error(f"Background refresh of {key} failed: {e}")
+
+
+def set_staleness_headers(response, read):
+    """Describe a CacheRead's freshness in response headers"""
+    response.headers["X-Cache-Hit"] = "true"
+    response.headers["X-Cache-Stale"] = "true" if read.stale else "false"
+    response.headers["Age"] = str(read.age_seconds)
+
+
+# Global revalidator instance
+revalidator = Revalidator()
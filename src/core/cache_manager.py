@@ -1,68 +1,228 @@
 """Simple in-memory cache manager with TTL support"""
+import asyncio
+import heapq
+import itertools
+import logging
+import sys
 import time
-from typing import Any, Optional, Dict
+from collections import OrderedDict
+from typing import Any, Optional, Dict, List, Tuple
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CacheEntry:
     value: Any
     expires_at: float
+    size: int = 0
+    freq: int = 1
+    seq: int = 0  # Matches the entry's live item in the expiry heap
 
 
 class CacheManager:
-    """In-memory cache with TTL"""
-    
-    def __init__(self):
+    """In-memory cache with TTL, bounded by entry count and approximate bytes
+
+    Expiry times sit in a min-heap, so removing expired entries costs only
+    the entries that actually expired, and a background sweeper (see
+    start_sweeper) reclaims keys that are never read again. Over either
+    limit, the least recently (`policy='lru'`) or least frequently
+    (`policy='lfu'`) used entry is evicted in O(1). Counters are kept up to
+    date on every change, so stats() is O(1).
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, policy: str = 'lru'):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+
         self._cache: Dict[str, CacheEntry] = {}
-    
+        self._recency: "OrderedDict[str, None]" = OrderedDict()  # lru: oldest first
+        self._freqs: Dict[int, "OrderedDict[str, None]"] = {}  # lfu: freq -> keys, oldest first
+        self._min_freq = 1
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        if key not in self._cache:
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
             return None
-        
-        entry = self._cache[key]
-        
+
         # Check if expired
         if time.time() > entry.expires_at:
-            del self._cache[key]
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
             return None
-        
+
+        self._touch(key, entry)
+        self.hits += 1
         return entry.value
-    
-    async def set(self, key: str, value: Any, ttl: int = 300):
-        """Set value in cache with TTL in seconds"""
-        expires_at = time.time() + ttl
-        self._cache[key] = CacheEntry(value=value, expires_at=expires_at)
-    
+
+    async def set(self, key: str, value: Any, ttl: int = 300, size: int = None):
+        """Set value in cache with TTL in seconds; size defaults to an estimate of the value's footprint"""
+        if size is None:
+            size = estimate_size(value)
+        if key in self._cache:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+
+        # Make room first so a new LFU entry (freq 1) isn't its own victim
+        while self._cache and (len(self._cache) >= self.max_entries or self._bytes + size > self.max_bytes):
+            self._remove(self._victim())
+            self.evictions += 1
+
+        entry = CacheEntry(value=value, expires_at=time.time() + ttl, size=size, seq=next(self._seq))
+        self._cache[key] = entry
+        self._link(key, entry)
+        self._bytes += size
+        heapq.heappush(self._heap, (entry.expires_at, entry.seq, key))
+        self._compact_heap()
+
     async def delete(self, key: str):
         """Delete key from cache"""
         if key in self._cache:
-            del self._cache[key]
-    
+            self._remove(key)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with prefix"""
+        keys = [k for k in self._cache if k.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
     async def clear(self):
         """Clear all cache"""
         self._cache.clear()
-    
-    async def cleanup_expired(self):
-        """Remove expired entries"""
+        self._recency.clear()
+        self._freqs.clear()
+        self._min_freq = 1
+        self._heap.clear()
+        self._bytes = 0
+
+    async def cleanup_expired(self) -> int:
+        """Remove expired entries, popping them off the expiry heap"""
         now = time.time()
-        expired = [k for k, v in self._cache.items() if now > v.expires_at]
-        for key in expired:
-            del self._cache[key]
-    
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._cache.get(key)
+            if entry is not None and entry.seq == seq:
+                self._remove(key, compact=False)
+                removed += 1
+        self.expirations += removed
+        return removed
+
+    def start_sweeper(self, interval: float = 10.0):
+        """Periodically remove expired entries in the background"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep(interval))
+
+    def stop_sweeper(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    async def _sweep(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.cleanup_expired()
+                if removed:
+                    logger.debug(f"Swept {removed} expired cache entries")
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {e}")
+
     def stats(self) -> Dict:
         """Get cache statistics"""
-        now = time.time()
-        total = len(self._cache)
-        expired = sum(1 for v in self._cache.values() if now > v.expires_at)
-        
+        lookups = self.hits + self.misses
+
         return {
-            'total_entries': total,
-            'active_entries': total - expired,
-            'expired_entries': expired
+            'total_entries': len(self._cache),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'policy': self.policy,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations
         }
 
+    def _link(self, key: str, entry: CacheEntry):
+        if self.policy == 'lru':
+            self._recency[key] = None
+        else:
+            self._freqs.setdefault(entry.freq, OrderedDict())[key] = None
+            self._min_freq = 1
+
+    def _unlink(self, key: str, entry: CacheEntry):
+        if self.policy == 'lru':
+            del self._recency[key]
+        else:
+            bucket = self._freqs[entry.freq]
+            del bucket[key]
+            if not bucket:
+                del self._freqs[entry.freq]
+
+    def _touch(self, key: str, entry: CacheEntry):
+        if self.policy == 'lru':
+            self._recency.move_to_end(key)
+        else:
+            self._unlink(key, entry)
+            if entry.freq == self._min_freq and entry.freq not in self._freqs:
+                self._min_freq += 1
+            entry.freq += 1
+            self._freqs.setdefault(entry.freq, OrderedDict())[key] = None
+
+    def _victim(self) -> str:
+        if self.policy == 'lru':
+            return next(iter(self._recency))
+        if self._min_freq not in self._freqs:
+            # Removals can empty the lowest bucket without a new minimum being set
+            self._min_freq = min(self._freqs)
+        return next(iter(self._freqs[self._min_freq]))
+
+    def _remove(self, key: str, compact: bool = True):
+        entry = self._cache.pop(key)
+        self._unlink(key, entry)
+        self._bytes -= entry.size
+        # Heap items of removed entries are skipped lazily and dropped by _compact_heap
+        if compact:
+            self._compact_heap()
+
+    def _compact_heap(self):
+        """Rebuild the heap once dead items outnumber live entries"""
+        if len(self._heap) > 2 * len(self._cache) + 64:
+            self._heap = [(e.expires_at, e.seq, k) for k, e in self._cache.items()]
+            heapq.heapify(self._heap)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of plain data (dicts, lists, strings, dataclasses)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(estimate_size(v) for v in value)
+    elif hasattr(value, '__dict__'):
+        size += estimate_size(vars(value))
+    return size
+
 
 # Global cache instance
 cache = CacheManager()
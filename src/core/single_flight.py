@@ -0,0 +1,71 @@
+"""Single-flight coalescing of identical concurrent operations"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Run at most one operation per key at a time
+
+    Callers that arrive while an operation for their key is in flight await
+    that same operation and share its result. A successful result is also
+    served to callers arriving within `window` seconds after it completes.
+    Failures are never shared beyond the callers already waiting.
+    """
+
+    def __init__(self, window: float = 0):
+        self.window = window
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.window_hits = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Return func()'s result, sharing it with concurrent callers of the same key"""
+        self._purge_recent()
+
+        recent = self._recent.get(key)
+        if recent:
+            self.window_hits += 1
+            return recent[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.create_task(self._run(key, func))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shield so one caller disconnecting doesn't cancel the others' scrape
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether an operation for key is currently running"""
+        return key in self._inflight
+
+    async def _run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await func()
+            if self.window > 0:
+                self._recent[key] = (time.monotonic(), result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _purge_recent(self):
+        """Drop results older than the window"""
+        now = time.monotonic()
+        expired = [k for k, (at, _) in self._recent.items() if now - at >= self.window]
+        for key in expired:
+            del self._recent[key]
+
+    def stats(self) -> Dict:
+        """Get coalescing statistics"""
+        return {
+            'in_flight': len(self._inflight),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'window_hits': self.window_hits,
+        }
@@ -3,25 +3,78 @@ import asyncio
 import json
 import logging
 import re
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional, Tuple, AsyncIterator, Callable
+from urllib.parse import urlparse
 from playwright.async_api import Page
+from config.settings import settings
 from src.scraper.retry_decorator import retry_on_session_loss
 from src.scraper.dom_extractor import DOMPostExtractor
+from src.scraper.resource_blocker import ResourceBlocker, TransferMeter, lean_stats
+from src.scraper.image_capture import ImageCapture
 
 logger = logging.getLogger(__name__)
 
+def is_cdn_image(url: str) -> bool:
+    """Whether url is a photo on Facebook's content CDN (scontent-*.fbcdn.net)"""
+    if not url.startswith('http'):
+        return False
+    host = urlparse(url).hostname or ''
+    return host.endswith('.fbcdn.net') and host.startswith('scontent')
+
 class FeedAggregator:
-    def __init__(self, page: Page, session_manager=None):
+    def __init__(self, page: Page, session_manager=None, lean: Optional[bool] = None,
+                 capture: Optional[ImageCapture] = None):
         self.page = page
         self.session_manager = session_manager
         self.post_urls = []  # Changed from set to list to preserve order
+        self._graphql_payloads = 0
+        self._graphql_arrived = asyncio.Event()
+        
+        # Posts built straight from timeline GraphQL payloads, keyed by URL
+        self.graphql_posts: Dict[str, Dict] = {}
+        self._author: Optional[Dict] = None
+        
+        # Incremental mode: friend URL -> newest post URL already cached
+        self.watermarks: Optional[Dict[str, str]] = None
+        self.newest_urls: Dict[str, str] = {}
+        
+        # Receives progress/post events as they happen (see stream_feed)
+        self.on_event: Optional[Callable[[Dict], None]] = None
+        
+        # Lean mode aborts image/media/font/beacon requests we never read
+        self.lean = settings.LEAN_SCRAPING if lean is None else lean
+        self.blocker = ResourceBlocker(page, keep_cdn_images=capture is not None) if self.lean else None
+        self.meter = TransferMeter(page) if self.lean else None
+        
+        # Opt-in: keep the fbcdn images this page downloads for the media cache
+        self.capture = capture
+        if capture:
+            capture.attach(page)
     
     @retry_on_session_loss(max_retries=2)
-    async def get_feed(self, friends: List[Dict], following: List[Dict], limit: int = 20, include_own_profile: bool = True) -> List[Dict]:
-        """Get posts by scraping each friend's profile"""
+    async def get_feed(self, friends: List[Dict], following: List[Dict], limit: int = 20, include_own_profile: bool = True,
+                       concurrency: Optional[int] = None, max_friends: Optional[int] = None,
+                       posts_per_friend: Optional[int] = None,
+                       watermarks: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Get posts by scraping each friend's profile
+        
+        With concurrency > 1 friends are scraped on separate tabs of the same
+        browser context and merged as each tab finishes.
+        
+        Passing watermarks (friend URL -> newest cached post URL) enables
+        incremental mode: each friend's timeline is only scrolled until a known
+        post appears and only newer posts are returned. The newest post URL seen
+        per friend is left in self.newest_urls for the caller to persist.
+        """
         all_posts = []
+        self.watermarks = watermarks
+        self.newest_urls = {}  # only friends scraped by this call
+        concurrency = concurrency or settings.FEED_CONCURRENCY
+        max_friends = max_friends if max_friends is not None else settings.FEED_MAX_FRIENDS
+        posts_per_friend = posts_per_friend or settings.FEED_POSTS_PER_FRIEND
         
-        logger.info(f"[FEED] Starting feed aggregation: {len(friends)} friends, limit={limit}")
+        logger.info(f"[FEED] Starting feed aggregation: {len(friends)} friends, limit={limit}, concurrency={concurrency}")
         
         # First, scrape your own profile posts
         if include_own_profile:
@@ -33,18 +86,20 @@ class FeedAggregator:
             except Exception as e:
                 logger.error(f"[FEED] Error scraping own profile: {e}")
         
-        # Scrape posts from each friend's profile
-        for friend in friends[:2]:  # Limit to 2 friends max
-            try:
-                logger.info(f"[FEED] Scraping friend: {friend['name']}")
-                posts = await self._scrape_friend_profile(friend, posts_per_friend=10)
-                logger.info(f"[FEED] Got {len(posts)} posts from {friend['name']}")
+        # Scrape posts from each friend's profile, merging as each one finishes
+        friend_posts = self.iter_friend_posts(friends[:max_friends], posts_per_friend, concurrency)
+        try:
+            async for friend, posts in friend_posts:
                 all_posts.extend(posts)
                 if len(all_posts) >= limit:
                     break
-            except Exception as e:
-                logger.error(f"[FEED] Error scraping {friend['name']}: {e}")
-                continue
+        finally:
+            await friend_posts.aclose()
+            if self.blocker:
+                await self.blocker.detach()
+                logger.info(f"[FEED] Lean mode: {lean_stats.summary()}")
+            if self.capture:
+                self.capture.detach(self.page)
         
         # Don't scrape following feed - only show friends' posts
         # following_posts = await self._scrape_following_feed(following, limit=10)
@@ -61,6 +116,145 @@ class FeedAggregator:
         unique_posts.sort(key=lambda p: p.get('timestamp', ''), reverse=True)
         return unique_posts[:limit]
     
+    async def iter_friend_posts(self, friends: List[Dict], posts_per_friend: int,
+                                concurrency: int = 1) -> AsyncIterator[Tuple[Dict, List[Dict]]]:
+        """Yield (friend, posts) as each friend's profile finishes scraping
+        
+        Friends are scraped one after another on this page when concurrency is 1,
+        otherwise on up to `concurrency` tabs opened in the page's browser context.
+        Closing the iterator early cancels any scrapes still in flight.
+        """
+        if concurrency <= 1:
+            for friend in friends:
+                yield friend, await self._scrape_friend_safely(friend, posts_per_friend)
+            return
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def scrape_in_tab(friend: Dict) -> Tuple[Dict, List[Dict]]:
+            async with semaphore:
+                try:
+                    tab = await self._open_tab()
+                except Exception as e:
+                    logger.error(f"[FEED] Could not open tab for {friend['name']}: {e}")
+                    return friend, []
+                try:
+                    worker = FeedAggregator(tab, self.session_manager, lean=self.lean, capture=self.capture)
+                    worker.watermarks = self.watermarks
+                    worker.newest_urls = self.newest_urls
+                    worker.on_event = self.on_event
+                    return friend, await worker._scrape_friend_safely(friend, posts_per_friend)
+                finally:
+                    if self.capture:
+                        self.capture.detach(tab)
+                    try:
+                        await tab.close()
+                    except:
+                        pass
+        
+        tasks = [asyncio.create_task(scrape_in_tab(friend)) for friend in friends]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _scrape_friend_safely(self, friend: Dict, posts_per_friend: int) -> List[Dict]:
+        """Scrape a friend's profile, logging and swallowing any error"""
+        author = {'name': friend['name'], 'url': friend['url']}
+        try:
+            logger.info(f"[FEED] Scraping friend: {friend['name']}")
+            self._emit('friend_start', friend=author)
+            posts = await self._scrape_friend_profile(friend, posts_per_friend=posts_per_friend)
+            logger.info(f"[FEED] Got {len(posts)} posts from {friend['name']}")
+            self._emit('friend_done', friend=author, count=len(posts))
+            return posts
+        except Exception as e:
+            logger.error(f"[FEED] Error scraping {friend['name']}: {e}")
+            self._emit('friend_done', friend=author, count=0, error=str(e))
+            return []
+    
+    async def stream_feed(self, friends: List[Dict], limit: int = 20, **kwargs) -> AsyncIterator[Dict]:
+        """Run get_feed and yield its events as they happen
+        
+        Yields `friend_start`, `post` and `friend_done` events while friends are
+        being scraped, then a final `done` (or `error`) event. Posts are
+        deduplicated by content and capped at `limit`, like get_feed.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        self.on_event = events.put_nowait
+        task = asyncio.create_task(
+            self.get_feed(friends, [], limit=limit, include_own_profile=False, **kwargs)
+        )
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        
+        seen = set()
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                if event['event'] == 'post':
+                    content = event['post']['content']
+                    if content in seen or len(seen) >= limit:
+                        continue
+                    seen.add(content)
+                yield event
+            
+            if task.exception():
+                yield {'event': 'error', 'message': str(task.exception())}
+            else:
+                yield {'event': 'done', 'count': len(seen)}
+        finally:
+            self.on_event = None
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    
+    def _emit(self, event: str, **data):
+        """Pass an event to on_event, if anyone is listening"""
+        if self.on_event:
+            self.on_event({'event': event, **data})
+    
+    async def _open_tab(self) -> Page:
+        """Open another tab in the same browser context as self.page"""
+        if self.session_manager:
+            return await self.session_manager.new_page(self.page.context)
+        return await self.page.context.new_page()
+    
+    async def _goto(self, url: str, rules: str, **kwargs):
+        """Navigate self.page under the given lean rules, recording load time and bytes
+        
+        In lean mode an occasional load runs unblocked (see LeanStats.take_baseline)
+        so /debug/lean-stats can compare the two.
+        """
+        lean = self.lean
+        if self.blocker:
+            lean = not lean_stats.take_baseline(rules)
+            if lean:
+                self.blocker.use(rules)
+                await self.blocker.attach()
+            else:
+                await self.blocker.detach()
+        
+        if self.meter:
+            self.meter.start()
+        started = time.monotonic()
+        try:
+            response = await self.page.goto(url, **kwargs)
+        except Exception:
+            if self.meter:
+                await self.meter.stop()
+            if not lean:
+                lean_stats.release_baseline(rules)
+            raise
+        elapsed = time.monotonic() - started
+        transferred = await self.meter.stop() if self.meter else None
+        lean_stats.record_load(rules, elapsed, lean=lean, transferred=transferred)
+        return response
+    
     async def _handle_cookie_consent(self, page):
         """Handle cookie consent dialog if present"""
         try:
@@ -88,48 +282,29 @@ class FeedAggregator:
         author = {'name': 'Mark Retallack', 'url': 'https://www.facebook.com/me'}
         
         self.post_urls.clear()
+        self.graphql_posts.clear()
+        self._author = author
         
         # Intercept GraphQL responses
-        async def handle_response(response):
-            if '/api/graphql/' in response.url and response.status == 200:
-                try:
-                    text = await response.text()
-                    for line in text.split('\n'):
-                        if line.strip():
-                            data = json.loads(line)
-                            self._extract_urls(data)
-                except:
-                    pass
-        
-        self.page.on('response', handle_response)
+        self.page.on('response', self._handle_graphql_response)
         
-        await self.page.goto("https://www.facebook.com/me", wait_until='networkidle')
+        await self._goto("https://www.facebook.com/me", 'timeline', wait_until='networkidle')
         await asyncio.sleep(3)
         
-        # Scroll to trigger GraphQL requests
-        for _ in range(5):
-            await self.page.evaluate('window.scrollBy(0, document.body.scrollHeight)')
-            await asyncio.sleep(2)
+        # Scroll to trigger GraphQL requests until we have enough posts
+        await self._scroll_for_posts(target=posts_limit, max_scrolls=5)
         
         # Remove handler before fetching posts
-        self.page.remove_listener('response', handle_response)
+        self.page.remove_listener('response', self._handle_graphql_response)
         
-        # Fetch posts from collected URLs
+        # Build posts from GraphQL, fetching only those with missing fields
         posts = []
         for url in list(self.post_urls)[:posts_limit]:
             try:
-                logger.info(f"[DEBUG] Fetching post: {url}")
-                content = await self._fetch_post(url)
-                if content and content.get('text'):
-                    posts.append({
-                        'id': url,  # Use URL as ID
-                        'author': {'name': author['name'], 'profile_url': author['url']},
-                        'content': content['text'],
-                        'url': url,
-                        'timestamp': '',
-                        'image_url': content.get('image')
-                    })
-                    logger.info(f"[DEBUG] ✓ Fetched post successfully")
+                post = await self._build_post(url, author)
+                if post:
+                    posts.append(post)
+                    self._emit('post', post=post)
             except Exception as e:
                 logger.warning(f"Skipping post {url}: {e}")
                 continue
@@ -142,22 +317,13 @@ class FeedAggregator:
         logger.info(f"[DEBUG] Scraping profile: {friend['name']} at {friend['url']}")
         
         self.post_urls.clear()
+        self.graphql_posts.clear()
+        self._author = friend
         
         # Intercept GraphQL responses
-        async def handle_response(response):
-            if '/api/graphql/' in response.url and response.status == 200:
-                try:
-                    text = await response.text()
-                    for line in text.split('\n'):
-                        if line.strip():
-                            data = json.loads(line)
-                            self._extract_urls(data)
-                except:
-                    pass
-        
-        self.page.on('response', handle_response)
+        self.page.on('response', self._handle_graphql_response)
         
-        await self.page.goto(friend['url'], wait_until='networkidle')
+        await self._goto(friend['url'], 'timeline', wait_until='networkidle')
         await asyncio.sleep(3)
         
         # FIRST: Extract posts from initial DOM
@@ -176,14 +342,18 @@ class FeedAggregator:
                                 self.post_urls.append(href)
         
         # SECOND: Scroll to trigger GraphQL requests for older posts
-        for _ in range(15):  # Increased from 10 to 15 for more posts
-            await self.page.evaluate('window.scrollBy(0, document.body.scrollHeight)')
-            await asyncio.sleep(2)
+        known_url = self.watermarks.get(friend['url']) if self.watermarks else None
+        await self._scroll_for_posts(
+            target=posts_per_friend,
+            max_scrolls=settings.SCROLL_MAX,
+            wanted=lambda url: '/photo/' in url,
+            stop_at=known_url
+        )
         
         # Remove handler before fetching posts
-        self.page.remove_listener('response', handle_response)
+        self.page.remove_listener('response', self._handle_graphql_response)
         
-        # Fetch posts from collected URLs (limit to 6 per friend)
+        # Build posts from GraphQL, fetching only those with missing fields (limited to the per-friend quota)
         posts = []
         unique_urls = []
         for url in self.post_urls:
@@ -193,29 +363,135 @@ class FeedAggregator:
         # Filter to only photo posts
         photo_urls = [url for url in unique_urls if '/photo/' in url]
         
-        for url in photo_urls[:6]:  # Limit to 6 photos
+        # Incremental: only posts newer than the one we already have
+        if known_url in photo_urls:
+            photo_urls = photo_urls[:photo_urls.index(known_url)]
+            logger.info(f"[FEED] {friend['name']}: {len(photo_urls)} new posts since last scrape")
+        
+        for url in photo_urls[:posts_per_friend]:
             try:
-                logger.info(f"[DEBUG] Fetching post: {url}")
-                content = await self._fetch_post(url)
-                if content and content.get('text'):
-                    posts.append({
-                        'id': url,  # Use URL as ID
-                        'author': {'name': friend['name'], 'profile_url': friend['url']},
-                        'content': content['text'],
-                        'url': url,
-                        'timestamp': content.get('timestamp', ''),
-                        'image_url': content.get('image')
-                    })
-                    logger.info(f"[DEBUG] ✓ Fetched post successfully")
+                post = await self._build_post(url, friend)
+                if post:
+                    posts.append(post)
+                    self._emit('post', post=post)
             except Exception as e:
                 logger.warning(f"Skipping post {url}: {e}")
                 continue
         
+        if posts:
+            self.newest_urls[friend['url']] = posts[0]['url']
+        
         logger.info(f"[DEBUG] Finished scraping {friend['name']}: {len(posts)} posts")
         return posts
     
-    def _extract_urls(self, data):
+    async def _handle_graphql_response(self, response):
+        """Collect post URLs (and, in GraphQL-first mode, posts) from a timeline GraphQL response"""
+        if '/api/graphql/' in response.url and response.status == 200:
+            try:
+                text = await response.text()
+                for line in text.split('\n'):
+                    if line.strip():
+                        data = json.loads(line)
+                        self._extract_urls(data)
+                        if settings.GRAPHQL_FIRST and self._author:
+                            for post in self._extract_posts_from_json(data, self._author):
+                                self._remember_graphql_post(post)
+            except:
+                pass
+            self._graphql_payloads += 1
+            self._graphql_arrived.set()
+    
+    def _remember_graphql_post(self, post: Dict):
+        """Index a GraphQL post by URL, keeping the most complete copy"""
+        url = post.get('url')
+        if not url:
+            return
+        existing = self.graphql_posts.get(url)
+        if not existing or (self._is_complete(post) and not self._is_complete(existing)):
+            self.graphql_posts[url] = post
+    
+    def _is_complete(self, post: Dict) -> bool:
+        """Whether a GraphQL post has everything _fetch_post would have given us"""
+        if not post.get('content') or post['content'] == '[Photo post]':
+            return False
+        if '/photo/' in post.get('url', '') and not post['media']['images']:
+            return False
+        return True
+    
+    async def _build_post(self, url: str, author: Dict) -> Optional[Dict]:
+        """Build a post from its GraphQL payload, navigating to it only if fields are missing"""
+        story = self.graphql_posts.get(url) if settings.GRAPHQL_FIRST else None
+        if story and self._is_complete(story):
+            images = story['media']['images']
+            return {
+                'id': url,  # Use URL as ID
+                'author': {'name': author['name'], 'profile_url': author['url']},
+                'content': story['content'],
+                'url': url,
+                'timestamp': self._format_timestamp(story.get('timestamp')),
+                'image_url': images[0] if images else None
+            }
+        
+        logger.info(f"[DEBUG] Fetching post: {url}")
+        content = await self._fetch_post(url)
+        if content and content.get('text'):
+            logger.info(f"[DEBUG] ✓ Fetched post successfully")
+            return {
+                'id': url,  # Use URL as ID
+                'author': {'name': author['name'], 'profile_url': author['url']},
+                'content': content['text'],
+                'url': url,
+                'timestamp': content.get('timestamp', ''),
+                'image_url': content.get('image')
+            }
+        return None
+    
+    def _format_timestamp(self, created_time) -> str:
+        """Format a GraphQL created_time (unix seconds) like _fetch_post does"""
+        if isinstance(created_time, (int, float)) and created_time > 0:
+            from datetime import datetime
+            return datetime.fromtimestamp(int(created_time)).strftime('%Y-%m-%d %H:%M:%S')
+        return str(created_time or '')
+    
+    async def _scroll_for_posts(self, target: int, max_scrolls: int, wanted: Callable[[str], bool] = None,
+                                stop_at: Optional[str] = None):
+        """Scroll until `target` wanted post URLs are known or GraphQL goes quiet
+        
+        Each scroll waits for the next /api/graphql/ response instead of a fixed
+        sleep, and scrolling stops after SCROLL_IDLE_LIMIT scrolls in a row
+        that bring in no new payloads, or as soon as the `stop_at` URL is seen.
+        """
+        idle_scrolls = 0
+        for scroll in range(max_scrolls):
+            if stop_at and stop_at in self.post_urls:
+                logger.info(f"[FEED] Reached already-cached post after {scroll} scrolls")
+                return
+            
+            found = sum(1 for url in self.post_urls if not wanted or wanted(url))
+            if found >= target:
+                logger.info(f"[FEED] Found {found} post URLs after {scroll} scrolls")
+                return
+            
+            payloads_before = self._graphql_payloads
+            self._graphql_arrived.clear()
+            await self.page.evaluate('window.scrollBy(0, document.body.scrollHeight)')
+            try:
+                await asyncio.wait_for(self._graphql_arrived.wait(), timeout=settings.SCROLL_RESPONSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            
+            if self._graphql_payloads == payloads_before:
+                idle_scrolls += 1
+                if idle_scrolls >= settings.SCROLL_IDLE_LIMIT:
+                    logger.info(f"[FEED] No new GraphQL payloads for {idle_scrolls} scrolls, stopping")
+                    return
+            else:
+                idle_scrolls = 0
+    
+    def _extract_urls(self, data, urls: List[str] = None):
         """Extract post URLs from GraphQL response"""
+        if urls is None:
+            urls = self.post_urls
         if isinstance(data, dict):
             for key, value in data.items():
                 if key in ['permalink_url', 'wwwURL', 'url'] and isinstance(value, str):
@@ -227,18 +503,18 @@ class FeedAggregator:
                         continue
                     # Only include profile posts and photos
                     if '/posts/' in value or ('/photo/' in value and 'set=a.' in value):
-                        if value not in self.post_urls:  # Avoid duplicates while preserving order
-                            self.post_urls.append(value)
+                        if value not in urls:  # Avoid duplicates while preserving order
+                            urls.append(value)
                 elif isinstance(value, (dict, list)):
-                    self._extract_urls(value)
+                    self._extract_urls(value, urls)
         elif isinstance(data, list):
             for item in data:
-                self._extract_urls(item)
+                self._extract_urls(item, urls)
     
     async def _fetch_post(self, url):
         """Fetch content from a single post"""
         try:
-            await self.page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            await self._goto(url, 'post', wait_until='domcontentloaded', timeout=30000)
             await asyncio.sleep(2)
             
             # Try to extract timestamp
@@ -322,8 +598,13 @@ class FeedAggregator:
         
         return posts[:limit]
     
-    def _extract_images_from_object(self, obj, images=None, depth=0) -> List[str]:
-        """Recursively extract all image URLs from any object"""
+    def _extract_images_from_object(self, obj, images=None, depth=0, parent_key: str = '') -> List[str]:
+        """Recursively extract photo URLs from any object
+        
+        Only `uri`/`src` fields of image/photo nodes (image, photo_image,
+        viewer_image, ...) pointing at the content CDN count; permalinks
+        under `url` and profile pictures are skipped.
+        """
         if images is None:
             images = []
         
@@ -331,25 +612,31 @@ class FeedAggregator:
             return images
         
         if isinstance(obj, dict):
-            # Check for direct image URL fields
-            for key in ['uri', 'src', 'url', 'image', 'photo']:
-                if key in obj and isinstance(obj[key], str):
-                    url = obj[key]
-                    if ('fbcdn.net' in url or 'facebook.com' in url) and url.startswith('http'):
-                        if url not in images:
+            if self._is_image_node(parent_key):
+                for key in ['uri', 'src']:
+                    if key in obj and isinstance(obj[key], str):
+                        url = obj[key]
+                        if is_cdn_image(url) and url not in images:
                             images.append(url)
             
             # Recurse into all values
-            for value in obj.values():
+            for key, value in obj.items():
                 if isinstance(value, (dict, list)):
-                    self._extract_images_from_object(value, images, depth + 1)
+                    self._extract_images_from_object(value, images, depth + 1, key)
         
         elif isinstance(obj, list):
             for item in obj:
                 if isinstance(item, (dict, list)):
-                    self._extract_images_from_object(item, images, depth + 1)
+                    self._extract_images_from_object(item, images, depth + 1, parent_key)
         
         return images
+    
+    @staticmethod
+    def _is_image_node(key: str) -> bool:
+        key = key.lower()
+        return ('image' in key or 'photo' in key) and 'profile' not in key
+    
+    def _extract_posts_from_json(self, obj, author: Dict, source_type: str = 'friend', posts=None) -> List[Dict]:
         """Extract posts from JSON and assign to author"""
         if posts is None:
             posts = []
@@ -420,10 +707,17 @@ class FeedAggregator:
                         import hashlib
                         post_id = hashlib.md5(f"{author['name']}_{text}_{story.get('created_time', '')}".encode()).hexdigest()
                     
+                    # Permalink, preferring the photo URL the scrapers collect
+                    story_urls = []
+                    self._extract_urls(story, story_urls)
+                    photo_urls = [u for u in story_urls if '/photo/' in u]
+                    url = (photo_urls or story_urls or [''])[0]
+                    
                     posts.append({
                         'id': post_id,
                         'author': {'name': author['name'], 'profile_url': author['url']},
                         'content': text,
+                        'url': url,
                         'timestamp': story.get('created_time', ''),
                         'post_type': 'text',
                         'is_sponsored': False,
@@ -0,0 +1,85 @@
+"""Keep image bodies the browser downloads while scraping, for the media cache"""
+import logging
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+from playwright.async_api import Page, Response
+
+logger = logging.getLogger(__name__)
+
+# Facebook's image CDN (scontent-*.xx.fbcdn.net)
+CAPTURE_HOST_SUFFIX = 'fbcdn.net'
+
+
+class ImageCapture:
+    """Buffers fbcdn image responses from one or more scraping pages
+
+    Attach it to the pages a scrape uses. Once the posts are extracted,
+    `take(urls)` hands back the bodies of the images those posts
+    reference, so they can go straight into the media cache instead of
+    being downloaded again. Everything else is discarded. At most
+    `max_bytes` are buffered; the oldest bodies are dropped first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._bodies: "OrderedDict[str, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        # The pages themselves, not id()s: a closed tab's id can be reused by a new one
+        self._pages: "weakref.WeakSet[Page]" = weakref.WeakSet()
+        self.captured = 0
+        self.used = 0
+        self.dropped = 0
+
+    def attach(self, page: Page):
+        if page not in self._pages:
+            page.on('response', self._on_response)
+            self._pages.add(page)
+
+    def detach(self, page: Page):
+        if page in self._pages:
+            try:
+                page.remove_listener('response', self._on_response)
+            except Exception as e:
+                logger.debug(f"Failed to remove capture listener: {e}")
+            self._pages.discard(page)
+
+    async def _on_response(self, response: Response):
+        if response.request.resource_type != 'image' or response.status != 200:
+            return
+        url = response.url
+        if not (urlparse(url).hostname or '').endswith(CAPTURE_HOST_SUFFIX) or url in self._bodies:
+            return
+        try:
+            body = await response.body()
+        except Exception as e:
+            # The page navigated away before the body could be read
+            logger.debug(f"Could not capture {url}: {e}")
+            return
+        if not body or len(body) > self.max_bytes:
+            return
+
+        self.captured += 1
+        self._bodies[url] = (body, response.headers.get('content-type'))
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            _, (dropped, _) = self._bodies.popitem(last=False)
+            self._bytes -= len(dropped)
+            self.dropped += 1
+
+    def take(self, urls: Iterable[str]) -> Dict[str, Tuple[bytes, Optional[str]]]:
+        """Bodies (and Content-Types) captured for urls; empties the buffer"""
+        wanted = {url: self._bodies[url] for url in urls if url in self._bodies}
+        self.used += len(wanted)
+        self._bodies.clear()
+        self._bytes = 0
+        return wanted
+
+    def stats(self) -> Dict:
+        return {
+            'captured': self.captured,
+            'used': self.used,
+            'dropped': self.dropped,
+            'buffered_bytes': self._bytes,
+        }
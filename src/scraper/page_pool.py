@@ -0,0 +1,176 @@
+"""Pool of browser tabs leased out per request"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List
+from playwright.async_api import BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+
+
+class PagePool:
+    """Bounded pool of tabs in one browser context
+
+    Pages are health-checked when they come back and recycled once they
+    have navigated `max_navigations` times, so long-lived tabs don't
+    accumulate memory from Facebook's single-page app.
+    """
+
+    def __init__(self, context: BrowserContext, page_factory: Callable[[BrowserContext], Awaitable[Page]],
+                 min_size: int = 1, max_size: int = 4, max_navigations: int = 50,
+                 health_check_timeout: float = 5.0):
+        self.context = context
+        self.page_factory = page_factory
+        self.max_size = max(max_size, 1)
+        self.min_size = min(max(min_size, 0), self.max_size)
+        self.max_navigations = max_navigations
+        self.health_check_timeout = health_check_timeout
+
+        self._idle: List[Page] = []
+        self._navigations: Dict[Page, int] = {}
+        self._size = 0
+        self._available = asyncio.Condition()
+        self._closed = False
+
+    async def start(self):
+        """Pre-open min_size pages"""
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                page = await self._create()
+            except Exception:
+                self._size -= 1
+                raise
+            self._idle.append(page)
+
+    async def close(self):
+        """Close idle pages; leased pages are closed when they are returned"""
+        async with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for page in idle:
+            await self._discard(page)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Borrow a page for the duration of the block"""
+        page = await self.acquire()
+        try:
+            yield page
+        finally:
+            await self.release(page)
+
+    async def acquire(self) -> Page:
+        """Take an idle page, opening a new one if below max_size"""
+        async with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Page pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                await self._available.wait()
+
+        try:
+            return await self._create()
+        except Exception:
+            async with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+
+    async def release(self, page: Page):
+        """Return a page, recycling it if unhealthy or worn out"""
+        navigations = self._navigations.get(page, 0)
+        if not self._closed and navigations < self.max_navigations and await self._is_healthy(page):
+            async with self._available:
+                if not self._closed:
+                    self._idle.append(page)
+                    self._available.notify()
+                    return
+
+        if navigations >= self.max_navigations:
+            logger.info(f"Recycling page after {navigations} navigations")
+        await self._discard(page)
+
+        # Keep the warm floor
+        if not self._closed and self._size < self.min_size:
+            try:
+                await self.start()
+                async with self._available:
+                    self._available.notify_all()
+            except Exception as e:
+                logger.warning(f"Could not replenish page pool: {e}")
+
+    def stats(self) -> Dict:
+        """Get pool statistics"""
+        return {
+            'size': self._size,
+            'idle': len(self._idle),
+            'leased': self._size - len(self._idle),
+            'max_size': self.max_size,
+        }
+
+    async def _create(self) -> Page:
+        """Open a page and start counting its main-frame navigations"""
+        page = await self.page_factory(self.context)
+        self._navigations[page] = 0
+
+        def on_navigated(frame):
+            if frame == page.main_frame:
+                self._navigations[page] = self._navigations.get(page, 0) + 1
+
+        page.on('framenavigated', on_navigated)
+        return page
+
+    async def _is_healthy(self, page: Page) -> bool:
+        """Check the page is open and its renderer still responds"""
+        if page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(page.evaluate('1'), timeout=self.health_check_timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"Page failed health check: {e}")
+            return False
+
+    async def _discard(self, page: Page):
+        """Close a page and free its slot"""
+        self._navigations.pop(page, None)
+        try:
+            await page.close()
+        except:
+            pass
+        async with self._available:
+            self._size -= 1
+            self._available.notify()
+
+
+class LeasedService:
+    """Build a page-bound service on a freshly leased page for every call
+
+    Wraps services like ProfileService or EventsService, which keep a single
+    `self.page`, so concurrent requests each get their own tab. Method calls
+    are forwarded unchanged: `await service.get_profile()`.
+    """
+
+    def __init__(self, session_manager, service_cls, *args, account_id: str = "default", **kwargs):
+        self.session_manager = session_manager
+        self.service_cls = service_cls
+        self.args = args
+        self.kwargs = kwargs
+        self.account_id = account_id
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not callable(getattr(self.service_cls, name, None)):
+            raise AttributeError(f"{self.service_cls.__name__} has no method {name}")
+
+        async def call(*args, **kwargs):
+            async with self.session_manager.lease(self.account_id) as page:
+                service = self.service_cls(page, *self.args, **self.kwargs)
+                return await getattr(service, name)(*args, **kwargs)
+
+        return call
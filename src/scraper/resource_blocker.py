@@ -0,0 +1,204 @@
+"""Lean scraping: abort requests for resources the scrapers never read"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from playwright.async_api import Page, Request, Route
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Logging and tracking beacons fired by facebook.com
+ANALYTICS_PATTERNS = [
+    '/ajax/bz',
+    '/ajax/bnzai',
+    '/ajax/webstorage/',
+    '/security/hsts-pixel',
+    'facebook.com/tr',
+    'google-analytics.com',
+    'doubleclick.net',
+]
+
+@dataclass
+class LeanRules:
+    """Allow/deny rules for one kind of page load"""
+    block_types: Set[str] = field(default_factory=set)
+    block_patterns: List[str] = field(default_factory=list)
+    allow_patterns: List[str] = field(default_factory=lambda: ['/api/graphql/'])
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if any(p in url for p in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return any(p in url for p in self.block_patterns)
+
+
+LEAN_RULES: Dict[str, LeanRules] = {
+    # Profile timelines are scrolled to trigger GraphQL paging, so keep CSS for layout
+    'timeline': LeanRules(
+        block_types={'image', 'media', 'font'},
+        block_patterns=ANALYTICS_PATTERNS,
+    ),
+    # Post pages are only read for the meta description and img src attributes
+    'post': LeanRules(
+        block_types={'image', 'media', 'font', 'stylesheet'},
+        block_patterns=ANALYTICS_PATTERNS,
+    ),
+}
+
+
+class LeanStats:
+    """Running totals of what lean mode blocked, and load time and bytes per page load
+
+    Loads are recorded per rules set, split into lean loads and full
+    (unblocked) ones. In lean mode `take_baseline` lets the first load of
+    each rules set, and every `baseline_every`-th after it, run unblocked,
+    so the lean and full averages can be compared within one process.
+    """
+
+    def __init__(self, baseline_every: int = 0):
+        self.blocked: Dict[str, int] = {}
+        self.baseline_every = baseline_every
+        # rules name -> lean flag -> [loads, total seconds, measured loads, total bytes]
+        self._loads: Dict[str, Dict[bool, List[float]]] = {}
+        # Lean loads since the last full one, per rules set
+        self._since_baseline: Dict[str, int] = {}
+        self._baseline_pending: Set[str] = set()
+
+    def record_blocked(self, resource_type: str):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+
+    def take_baseline(self, rules: str) -> bool:
+        """Whether the next load under these rules should run unblocked as a baseline"""
+        if rules in self._baseline_pending:
+            return False
+        has_full = False in self._loads.get(rules, {})
+        due = self.baseline_every and self._since_baseline.get(rules, 0) >= self.baseline_every
+        if has_full and not due:
+            return False
+        self._baseline_pending.add(rules)
+        return True
+
+    def release_baseline(self, rules: str):
+        """Give up a baseline taken for a load that failed"""
+        self._baseline_pending.discard(rules)
+
+    def record_load(self, rules: str, seconds: float, lean: bool, transferred: Optional[int] = None):
+        """Record one page load; transferred is the bytes received during it, if measured"""
+        totals = self._loads.setdefault(rules, {}).setdefault(lean, [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        if transferred is not None:
+            totals[2] += 1
+            totals[3] += transferred
+        if lean:
+            self._since_baseline[rules] = self._since_baseline.get(rules, 0) + 1
+        else:
+            self._since_baseline[rules] = 0
+            self._baseline_pending.discard(rules)
+
+    def summary(self) -> Dict:
+        """Blocked request counts, and average load times and bytes with and without lean mode"""
+        load_times = {}
+        for rules, by_mode in self._loads.items():
+            seconds = {lean: t[1] / t[0] for lean, t in by_mode.items() if t[0]}
+            transferred = {lean: t[3] / t[2] for lean, t in by_mode.items() if t[2]}
+            entry = {
+                'lean_loads': int(by_mode.get(True, [0])[0]),
+                'full_loads': int(by_mode.get(False, [0])[0]),
+                'lean_avg_s': round(seconds[True], 3) if True in seconds else None,
+                'full_avg_s': round(seconds[False], 3) if False in seconds else None,
+                'lean_avg_bytes': int(transferred[True]) if True in transferred else None,
+                'full_avg_bytes': int(transferred[False]) if False in transferred else None,
+            }
+            if True in seconds and False in seconds:
+                entry['saved_avg_s'] = round(seconds[False] - seconds[True], 3)
+            if True in transferred and False in transferred:
+                entry['saved_avg_bytes'] = int(transferred[False] - transferred[True])
+            load_times[rules] = entry
+
+        return {
+            'blocked_requests': dict(self.blocked),
+            'total_blocked': sum(self.blocked.values()),
+            'load_times': load_times,
+        }
+
+
+class TransferMeter:
+    """Counts the bytes a page receives between start() and stop()
+
+    Sums the response headers and bodies of every request that finished
+    in between, as reported by Playwright's `request.sizes()`. Aborted
+    requests never finish, so they count as zero.
+    """
+
+    def __init__(self, page: Page):
+        self.page = page
+        self._finished: List[Request] = []
+
+    def _on_finished(self, request: Request):
+        self._finished.append(request)
+
+    def start(self):
+        self._finished.clear()
+        self.page.on('requestfinished', self._on_finished)
+
+    async def stop(self) -> int:
+        try:
+            self.page.remove_listener('requestfinished', self._on_finished)
+        except Exception as e:
+            logger.debug(f"Failed to remove transfer listener: {e}")
+        finished = list(self._finished)
+        self._finished.clear()
+        sizes = await asyncio.gather(*(r.sizes() for r in finished), return_exceptions=True)
+        return sum(s['responseHeadersSize'] + max(s['responseBodySize'], 0)
+                   for s in sizes if isinstance(s, dict))
+
+
+class ResourceBlocker:
+    """Route handler that aborts requests matching the active LeanRules
+
+    With keep_cdn_images, fbcdn.net images are let through so an
+    ImageCapture on the page can keep them for the media cache.
+    """
+
+    def __init__(self, page: Page, stats: Optional[LeanStats] = None, keep_cdn_images: bool = False):
+        self.page = page
+        self.stats = stats or lean_stats
+        self.keep_cdn_images = keep_cdn_images
+        self.rules_name = 'timeline'
+        self.attached = False
+
+    async def attach(self):
+        if not self.attached:
+            await self.page.route('**/*', self._handle)
+            self.attached = True
+
+    async def detach(self):
+        if self.attached:
+            try:
+                await self.page.unroute('**/*', self._handle)
+            except Exception as e:
+                logger.debug(f"Failed to remove lean route: {e}")
+            self.attached = False
+
+    def use(self, rules_name: str):
+        """Switch the rules applied to subsequent requests"""
+        if rules_name not in LEAN_RULES:
+            raise ValueError(f"Unknown lean rules: {rules_name}")
+        self.rules_name = rules_name
+
+    async def _handle(self, route: Route):
+        request = route.request
+        if self.keep_cdn_images and request.resource_type == 'image' and 'fbcdn.net' in request.url:
+            await route.continue_()
+        elif LEAN_RULES[self.rules_name].should_block(request.resource_type, request.url):
+            self.stats.record_blocked(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+
+# Global stats instance
+lean_stats = LeanStats(baseline_every=settings.LEAN_BASELINE_EVERY)
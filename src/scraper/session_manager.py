@@ -1,10 +1,12 @@
 import json
 import asyncio
 import random
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Dict, Optional
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 from config.settings import settings
+from src.scraper.page_pool import PagePool
 
 class SessionManager:
     def __init__(self):
@@ -12,6 +14,7 @@ class SessionManager:
         self.browser: Browser = None
         self.contexts: Dict[str, BrowserContext] = {}
         self.pages: Dict[str, Page] = {}
+        self.pools: Dict[str, PagePool] = {}
         self.current_account: Optional[str] = None
         
         # Legacy single-account support
@@ -47,14 +50,7 @@ class SessionManager:
                 user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
             )
         
-        page = await context.new_page()
-        
-        # Hide automation flags
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
+        page = await self.new_page(context)
         
         self.contexts[account_id] = context
         self.pages[account_id] = page
@@ -70,6 +66,8 @@ class SessionManager:
         """Close browser and cleanup"""
         if account_id:
             # Close specific account
+            if account_id in self.pools:
+                await self.pools.pop(account_id).close()
             if account_id in self.pages:
                 try:
                     await self.pages[account_id].close()
@@ -84,6 +82,10 @@ class SessionManager:
                     pass
         else:
             # Close all
+            for pool in self.pools.values():
+                await pool.close()
+            self.pools.clear()
+            
             for page in self.pages.values():
                 try:
                     await page.close()
@@ -109,6 +111,43 @@ class SessionManager:
                 except:
                     pass
     
+    async def new_page(self, context: BrowserContext) -> Page:
+        """Open a new tab in context with automation flags hidden"""
+        page = await context.new_page()
+        
+        # Hide automation flags
+        await page.add_init_script("""
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            });
+        """)
+        return page
+    
+    async def get_pool(self, account_id: str = "default") -> PagePool:
+        """Get the page pool for account, creating it on first use"""
+        pool = self.pools.get(account_id)
+        if not pool:
+            context = self.contexts.get(account_id)
+            if not context:
+                raise ValueError(f"No context for account {account_id}")
+            pool = PagePool(
+                context,
+                self.new_page,
+                min_size=settings.PAGE_POOL_MIN_SIZE,
+                max_size=settings.PAGE_POOL_MAX_SIZE,
+                max_navigations=settings.PAGE_POOL_MAX_NAVIGATIONS
+            )
+            self.pools[account_id] = pool
+            await pool.start()
+        return pool
+    
+    @asynccontextmanager
+    async def lease(self, account_id: str = "default"):
+        """Borrow a pooled page for account: `async with session_manager.lease() as page:`"""
+        pool = await self.get_pool(account_id)
+        async with pool.lease() as page:
+            yield page
+    
     def get_page(self, account_id: str = "default") -> Optional[Page]:
         """Get page for account"""
         return self.pages.get(account_id)
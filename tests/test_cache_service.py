@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, text
+from src.cache.cache_service import CacheService
+from src.cache.database import init_database
+
+AUTHOR = 'https://www.facebook.com/friend.1'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheService(init_database(str(tmp_path / 'cache.db')))
+
+
+def make_posts(n):
+    return [{
+        'id': f'https://www.facebook.com/photo/?fbid={i}&set=a.1',
+        'author': {'name': 'Friend 1', 'profile_url': AUTHOR},
+        'content': f'Post {i}',
+        'url': f'https://www.facebook.com/photo/?fbid={i}&set=a.1',
+        'timestamp': '2026-01-01 12:00:00',
+        'image_url': None
+    } for i in range(n)]
+
+
+def test_touched_posts_stay_readable_past_hard_ttl(cache):
+    cache.upsert_posts(make_posts(5))
+    # Fetched long enough ago that the hard TTL, counted from fetch, would have passed
+    with cache.engine.begin() as conn:
+        conn.execute(text("UPDATE cached_posts SET fetched_at = :t"),
+                      {'t': datetime.utcnow() - timedelta(hours=25)})
+
+    cache.touch_posts([AUTHOR])
+
+    assert len(cache.get_posts(limit=10)) == 5
+    read = cache.read_posts(limit=10, allow_stale=True)
+    assert read is not None
+    assert len(read.data) == 5
+    assert not read.stale
+
+
+def test_stale_read_stops_at_hard_ttl(cache):
+    cache.upsert_posts(make_posts(2))
+    with cache.engine.begin() as conn:
+        conn.execute(text("UPDATE cached_posts SET fetched_at = :f, expires_at = :e"), {
+            'f': datetime.utcnow() - timedelta(hours=30),
+            'e': datetime.utcnow() - timedelta(hours=29),
+        })
+
+    assert cache.get_posts(limit=10) is None
+    assert cache.read_posts(limit=10, allow_stale=True) is None
+
+
+def test_watermarks_need_a_live_post(cache):
+    posts = make_posts(3)
+    cache.upsert_posts(posts)
+    cache.set_watermarks({AUTHOR: posts[0]['url']})
+    assert cache.get_watermarks([AUTHOR]) == {AUTHOR: posts[0]['url']}
+
+    # Aged out: the mark is ignored
+    with cache.engine.begin() as conn:
+        conn.execute(text("UPDATE cached_posts SET fetched_at = :t, expires_at = :t"),
+                     {'t': datetime.utcnow() - timedelta(hours=48)})
+    assert cache.get_watermarks([AUTHOR]) == {}
+
+
+def test_tombstoning_posts_clears_their_authors_watermark(cache):
+    posts = make_posts(3)
+    cache.upsert_posts(posts)
+    cache.set_watermarks({AUTHOR: posts[0]['url']})
+
+    # A full scrape without this friend's posts tombstones them
+    cache.set_posts([{
+        'id': 'https://www.facebook.com/other/posts/1',
+        'author': {'name': 'Other', 'profile_url': 'https://www.facebook.com/other'},
+        'content': 'Other post', 'url': 'https://www.facebook.com/other/posts/1',
+        'timestamp': '', 'post_type': 'text', 'is_sponsored': False, 'is_suggested': False,
+        'engagement': {'likes': 0, 'comments': 0, 'shares': 0},
+        'media': {'images': [], 'videos': []}
+    }])
+
+    assert cache.get_watermarks([AUTHOR]) == {}
+    with cache.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM friend_watermarks")).scalar() == 0
+
+
+def test_feed_pages_walk_the_keyset_index(cache):
+    cache.upsert_posts(make_posts(20))
+    statements = []
+    
+    def record(conn, cursor, statement, params, context, many):
+        statements.append((statement, params))
+    
+    event.listen(cache.engine, 'before_cursor_execute', record)
+    cache.read_posts(limit=5)
+    event.remove(cache.engine, 'before_cursor_execute', record)
+
+    statement, params = next((s, p) for s, p in statements if 'FROM cached_posts' in s)
+    with cache.engine.connect() as conn:
+        plan = ' '.join(row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params))
+    assert 'ix_cached_posts_live_first_seen_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_search_survives_vacuum(cache):
+    posts = make_posts(3)
+    posts[1]['content'] = 'Sunset over the harbour'
+    cache.upsert_posts(posts)
+    # Free some rowids so VACUUM renumbers the rest
+    with cache.engine.begin() as conn:
+        conn.execute(text("DELETE FROM cached_posts WHERE id = :id"), {'id': posts[0]['id']})
+    with cache.engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+
+    found = cache.search_posts('harbour')
+    assert [r['id'] for r in found['results']] == [posts[1]['id']]
+    assert '[harbour]' in found['results'][0]['snippet']
+
+    posts[1]['content'] = 'Sunrise over the bay'
+    cache.upsert_posts([posts[1]])
+    assert cache.search_posts('harbour')['results'] == []
+    assert [r['id'] for r in cache.search_posts('bay')['results']] == [posts[1]['id']]
+
+
+def test_upsert_rewrites_every_hashed_column(cache):
+    post = make_posts(1)[0]
+    post.update(timestamp='', image_url=None)
+    cache.upsert_posts([post])
+
+    post.update(timestamp='2026-01-02 08:00:00',
+                image_url='https://scontent.xx.fbcdn.net/v/photo.jpg')
+    cache.upsert_posts([post])
+
+    with cache.engine.connect() as conn:
+        row = conn.execute(text("SELECT timestamp, images FROM cached_posts")).one()
+    assert row.timestamp == '2026-01-02 08:00:00'
+    assert 'photo.jpg' in row.images
+
+
+def test_pages_hold_still_while_a_refresh_runs(cache):
+    posts = make_posts(10)
+    cache.upsert_posts(posts)
+    first = cache.read_posts(limit=4)
+
+    # A background refresh re-stores every post mid-way through the client's paging
+    cache.upsert_posts(list(reversed(posts)))
+    second = cache.read_posts(limit=4, before=first.next_cursor)
+    third = cache.read_posts(limit=4, before=second.next_cursor)
+
+    seen = [p['id'] for read in (first, second, third) for p in read.data]
+    assert len(seen) == len(set(seen)) == 10
+
+
+def test_first_seen_is_backfilled_on_migration(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    engine = init_database(path)
+    CacheService(engine).upsert_posts(make_posts(2))
+    with engine.begin() as conn:
+        for name in ('ix_cached_posts_live_first_seen_id', 'ix_cached_posts_live_source_first_seen_id',
+                     'ix_cached_posts_live_author_first_seen_id'):
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql("ALTER TABLE cached_posts DROP COLUMN first_seen_at")
+    engine.dispose()
+
+    engine = init_database(path)
+    with engine.connect() as conn:
+        missing = conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM cached_posts WHERE first_seen_at IS NULL OR first_seen_at != fetched_at"
+        ).scalar()
+    assert missing == 0
+    assert len(CacheService(engine).read_posts(limit=10).data) == 2
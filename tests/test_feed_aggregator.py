@@ -0,0 +1,43 @@
+import asyncio
+from src.scraper.feed_aggregator import FeedAggregator, is_cdn_image
+
+PHOTO = 'https://scontent-lhr8-1.xx.fbcdn.net/v/t39.30808-6/1_n.jpg?stp=dst-jpg&_nc_cat=1'
+PERMALINK = 'https://www.facebook.com/photo/?fbid=1&set=a.2'
+
+
+def test_is_cdn_image():
+    assert is_cdn_image(PHOTO)
+    assert not is_cdn_image(PERMALINK)
+    assert not is_cdn_image('https://static.xx.fbcdn.net/rsrc.php/v3/icon.png')
+    assert not is_cdn_image('https://evil.example/scontent.fbcdn.net/x.jpg')
+
+
+def test_images_skip_permalinks_and_profile_pictures():
+    aggregator = FeedAggregator(page=None, lean=False)
+    story = {
+        'url': PERMALINK,
+        'attachments': [{'media': {
+            'url': PERMALINK,
+            'photo_image': {'uri': PHOTO},
+            'owner': {'profile_picture': {'uri': 'https://scontent-lhr8-1.xx.fbcdn.net/v/t39.30808-1/avatar.jpg'}}
+        }}]
+    }
+    assert aggregator._extract_images_from_object(story) == [PHOTO]
+
+
+def test_images_found_under_photo_nodes():
+    aggregator = FeedAggregator(page=None, lean=False)
+    story = {'attachments': [{'styles': {'attachment': {'all_subattachments': {'nodes': [
+        {'media': {'image': {'uri': PHOTO}}},
+        {'media': {'viewer_image': {'uri': PHOTO.replace('1_n', '2_n')}}},
+    ]}}}}]}
+    assert aggregator._extract_images_from_object(story) == [PHOTO, PHOTO.replace('1_n', '2_n')]
+
+
+def test_each_feed_call_starts_with_no_newest_urls():
+    aggregator = FeedAggregator(page=None, lean=False)
+    aggregator.newest_urls = {'https://www.facebook.com/earlier.friend': PERMALINK}
+
+    asyncio.run(aggregator.get_feed([], [], include_own_profile=False))
+
+    assert aggregator.newest_urls == {}
@@ -0,0 +1,34 @@
+from src.scraper.image_capture import ImageCapture
+
+
+class FakePage:
+    def __init__(self):
+        self.listeners = []
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+
+def test_each_page_gets_its_own_listener():
+    capture = ImageCapture(max_bytes=1024)
+    first = FakePage()
+    capture.attach(first)
+    capture.attach(first)
+    assert len(first.listeners) == 1
+
+    capture.detach(first)
+    assert first.listeners == []
+
+    second = FakePage()
+    capture.attach(second)
+    assert len(second.listeners) == 1
+
+
+def test_closed_pages_are_not_kept():
+    capture = ImageCapture(max_bytes=1024)
+    for _ in range(3):
+        capture.attach(FakePage())
+    assert len(capture._pages) == 0
@@ -0,0 +1,60 @@
+import hashlib
+from src.cache.database import MediaObject, get_session, init_database
+from src.cache.media_store import MediaStore
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 60
+MD5 = hashlib.md5(b'https://scontent.xx.fbcdn.net/v/photo.jpg').hexdigest()
+
+
+def test_adopts_only_old_layout_files(tmp_path):
+    init_database(str(tmp_path / 'cache.db'))
+    root = tmp_path / 'media'
+    root.mkdir()
+    (root / f'{MD5}.jpg').write_bytes(JPEG)
+    (root / f'{MD5}_320x0.webp').write_bytes(b'variant')
+    (root / f'.{MD5}.jpg.{"0" * 32}.tmp').write_bytes(b'partial')
+    unrelated = ['.gitkeep', 'README_media.txt', 'notes.md', 'my_photo.jpg', f'{MD5}.png']
+    for name in unrelated:
+        (root / name).write_bytes(b'keep me')
+
+    store = MediaStore(root, max_bytes=10_000_000)
+    store.open()
+
+    path, content_type, content_hash = store.lookup(MD5)
+    assert content_hash == hashlib.sha256(JPEG).hexdigest()
+    assert content_type == 'image/jpeg'
+    assert path.read_bytes() == JPEG
+    remaining = sorted(p.name for p in root.iterdir() if p.is_file())
+    assert remaining == sorted(unrelated)
+
+
+def test_access_times_are_written_once_enough_are_pending(tmp_path):
+    init_database(str(tmp_path / 'cache.db'))
+    store = MediaStore(tmp_path / 'media', max_bytes=10_000_000, flush_after=2)
+    store.open()
+    hashes = []
+    for i in range(2):
+        body = JPEG + bytes([i])
+        tmp = store.temp_path(f'{i}.tmp')
+        tmp.write_bytes(body)
+        hashes.append(hashlib.sha256(body).hexdigest())
+        store.add(f'key{i}', None, tmp, hashes[-1], 'image/jpeg')
+    store.flush_access()
+
+    session = get_session()
+    try:
+        before = dict(session.query(MediaObject.content_hash, MediaObject.last_accessed))
+    finally:
+        session.close()
+
+    store.lookup('key0', touch=True)
+    assert store._accessed  # one pending: below the threshold
+    store.lookup('key1', touch=True)
+    assert not store._accessed
+
+    session = get_session()
+    try:
+        after = dict(session.query(MediaObject.content_hash, MediaObject.last_accessed))
+    finally:
+        session.close()
+    assert all(after[h] > before[h] for h in hashes)
@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+from src.cache.media_variants import FORMATS, VariantStore, source_format
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_resizing_keeps_the_original_format():
+    assert source_format('image/png') == 'png'
+    assert source_format('image/webp') == 'webp'
+    assert source_format('image/gif') == 'png'
+    assert source_format('image/jpeg') == 'jpeg'
+    assert source_format('image/heic') == 'jpeg'
+
+
+def test_png_resize_keeps_transparency(tmp_path):
+    original = tmp_path / 'abc.png'
+    Image.new('RGBA', (64, 32), (255, 0, 0, 0)).save(original)
+
+    fmt = source_format('image/png')
+    path = asyncio.run(VariantStore().get(original, 16, None, fmt))
+
+    assert path.suffix == f".{FORMATS[fmt][1]}"
+    with Image.open(path) as img:
+        assert img.format == 'PNG'
+        assert img.size == (16, 8)
+        assert img.mode == 'RGBA'
+        assert img.getpixel((0, 0))[3] == 0
@@ -0,0 +1,38 @@
+from src.scraper.resource_blocker import LeanStats
+
+
+def test_baseline_is_the_first_load_then_sampled():
+    stats = LeanStats(baseline_every=3)
+    assert stats.take_baseline('timeline')
+    assert not stats.take_baseline('timeline')  # already taken, not yet recorded
+    stats.record_load('timeline', 2.0, lean=False, transferred=900_000)
+
+    taken = []
+    for _ in range(6):
+        baseline = stats.take_baseline('timeline')
+        taken.append(baseline)
+        stats.record_load('timeline', 2.0 if baseline else 0.5, lean=not baseline,
+                          transferred=900_000 if baseline else 100_000)
+    assert taken == [False, False, False, True, False, False]
+
+
+def test_summary_compares_measured_loads():
+    stats = LeanStats()
+    stats.record_blocked('image')
+    stats.record_load('post', 1.5, lean=False, transferred=600_000)
+    stats.record_load('post', 0.5, lean=True, transferred=100_000)
+    stats.record_load('post', 0.7, lean=True, transferred=140_000)
+
+    summary = stats.summary()
+    assert summary['total_blocked'] == 1
+    post = summary['load_times']['post']
+    assert post['saved_avg_s'] == 0.9
+    assert post['saved_avg_bytes'] == 480_000
+    assert 'estimated_bytes_saved' not in summary
+
+
+def test_failed_baseline_is_released():
+    stats = LeanStats()
+    assert stats.take_baseline('post')
+    stats.release_baseline('post')
+    assert stats.take_baseline('post')